@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+# Copyright 2022 daohu527 <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Microbenchmark of lidar point cloud packing, reports points/second.
+
+  python benchmarks/lidar_benchmark.py --points 250000 --repeat 50
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import carla_bridge.common.point_cloud as pc
+
+
+def legacy_pack(raw_data):
+  lidar_data = np.frombuffer(bytes(raw_data), dtype=np.float32).copy()
+  lidar_data = np.reshape(lidar_data, (int(lidar_data.shape[0] / 4), 4))
+  lidar_data[:, 1] *= -1
+  return lidar_data.tobytes()
+
+
+def packed(raw_data):
+  payload, _ = pc.pack_points(raw_data, pc.LIDAR_DTYPE)
+  return payload
+
+
+def run(func, raw_data, num_points, repeat):
+  func(raw_data)
+  start = time.perf_counter()
+  for _ in range(repeat):
+    func(raw_data)
+  elapsed = time.perf_counter() - start
+  return num_points * repeat / elapsed
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument("--points", type=int, default=250000)
+  parser.add_argument("--repeat", type=int, default=50)
+  args = parser.parse_args()
+
+  raw_data = memoryview(np.random.rand(args.points * 4).astype(np.float32).tobytes())
+  assert bytes(legacy_pack(raw_data)) == bytes(packed(raw_data))
+
+  for name, func in (("legacy", legacy_pack), ("packed", packed)):
+    rate = run(func, raw_data, args.points, args.repeat)
+    print("{:<8} {:>14,.0f} points/s".format(name, rate))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+# Copyright 2022 daohu527 <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark of scene teardown time versus actor count.
+
+Every vehicle carries a number of sensors, the whole scene is destroyed
+vehicle by vehicle, once with the old scan over all actors and once with
+the parent/children index.
+
+  python benchmarks/teardown_benchmark.py --vehicles 100 500 1000 --sensors 4
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from carla_bridge.common.actor_index import ActorIndex
+
+
+class FakeActor(object):
+  def __init__(self, uid, parent):
+    self.uid = uid
+    self.parent = parent
+
+
+def build_scene(num_vehicles, num_sensors):
+  actors = {}
+  vehicles = []
+  uid = 1
+  for _ in range(num_vehicles):
+    vehicle = FakeActor(uid, None)
+    actors[uid] = vehicle
+    vehicles.append(uid)
+    uid += 1
+    for _ in range(num_sensors):
+      actors[uid] = FakeActor(uid, vehicle)
+      uid += 1
+  return actors, vehicles
+
+
+def legacy_teardown(actors, vehicles):
+  known_actor_ids = list(actors)
+
+  def get_objects_to_destroy(uid):
+    objects_to_destroy = []
+    if uid in known_actor_ids:
+      objects_to_destroy.append(uid)
+      known_actor_ids.remove(uid)
+    for actor in list(actors.values()):
+      if actor.parent is not None and actor.parent.uid == uid:
+        objects_to_destroy.extend(get_objects_to_destroy(actor.uid))
+    return objects_to_destroy
+
+  for uid in vehicles:
+    for obj in get_objects_to_destroy(uid):
+      del actors[obj]
+
+
+def indexed_teardown(actors, vehicles):
+  known_actor_ids = set(actors)
+  index = ActorIndex()
+  for actor in actors.values():
+    index.add(actor.uid, actor.parent.uid if actor.parent else None)
+
+  for uid in vehicles:
+    for obj in index.subtree(uid):
+      if obj in known_actor_ids:
+        known_actor_ids.discard(obj)
+        del actors[obj]
+        index.remove(obj)
+
+
+def measure(teardown, num_vehicles, num_sensors):
+  actors, vehicles = build_scene(num_vehicles, num_sensors)
+  start = time.perf_counter()
+  teardown(actors, vehicles)
+  elapsed = time.perf_counter() - start
+  assert not actors
+  return elapsed
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument("--vehicles", type=int, nargs="+", default=[100, 250, 500, 1000])
+  parser.add_argument("--sensors", type=int, default=4)
+  args = parser.parse_args()
+
+  print("{:>8} {:>12} {:>12}".format("actors", "legacy [s]", "indexed [s]"))
+  for num_vehicles in args.vehicles:
+    legacy = measure(legacy_teardown, num_vehicles, args.sensors)
+    indexed = measure(indexed_teardown, num_vehicles, args.sensors)
+    print("{:>8} {:>12.4f} {:>12.4f}".format(
+        num_vehicles * (args.sensors + 1), legacy, indexed))
+
+
+if __name__ == "__main__":
+  main()
@@ -26,33 +26,35 @@ class Actor(PseudoActor):
                                 parent=parent,
                                 node=node)
     self.carla_actor = carla_actor
+    self.state_cache = node.actor_state_cache
 
   def destroy(self):
     self.carla_actor = None
     super(Actor, self).destroy()
 
+  def get_carla_transform(self):
+    return self.state_cache.get_transform(self.carla_actor)
+
   def get_current_pose(self):
-    return trans.carla_transform_to_pose(
-        self.carla_actor.get_transform())
+    return trans.carla_transform_to_pose(self.get_carla_transform())
 
   def get_current_transform(self):
-    return trans.carla_transform_to_transform(
-        self.carla_actor.get_transform())
+    return trans.carla_transform_to_transform(self.get_carla_transform())
 
   def get_current_twist_rotated(self):
     return trans.carla_velocity_to_twist(
-            self.carla_actor.get_velocity(),
-            self.carla_actor.get_angular_velocity(),
-            self.carla_actor.get_transform().rotation)
+            self.state_cache.get_velocity(self.carla_actor),
+            self.state_cache.get_angular_velocity(self.carla_actor),
+            self.get_carla_transform().rotation)
 
   def get_current_twist(self):
     return trans.carla_velocity_to_twist(
-            self.carla_actor.get_velocity(),
-            self.carla_actor.get_angular_velocity())
+            self.state_cache.get_velocity(self.carla_actor),
+            self.state_cache.get_angular_velocity(self.carla_actor))
 
   def get_current_accel(self):
     return trans.carla_acceleration_to_accel(
-            self.carla_actor.get_acceleration())
+            self.state_cache.get_acceleration(self.carla_actor))
 
   def get_id(self):
     return self.carla_actor.id
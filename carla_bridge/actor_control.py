@@ -56,7 +56,7 @@ class ActorControl(PseudoActor):
     if self.parent and self.parent.carla_actor.is_alive:
       self.parent.carla_actor.set_transform(trans.pose_to_carla_transform(pose))
       if isinstance(self.parent, Sensor):
-        self.parent.relative_spawn_pose = pose
+        self.parent.set_relative_spawn_pose(pose)
 
   def on_twist(self, twist):
     if not self.parent.vehicle_control_override:
@@ -64,7 +64,7 @@ class ActorControl(PseudoActor):
       angular_velocity.z = math.degrees(twist.angular.z)
 
       rotation_matrix = trans.carla_rotation_to_numpy_rotation_matrix(
-          self.parent.carla_actor.get_transform().rotation)
+          self.parent.get_carla_transform().rotation)
       linear_vector = np.array([twist.linear.x, twist.linear.y, twist.linear.z])
       rotated_linear_vector = rotation_matrix.dot(linear_vector)
       linear_velocity = Vector3D()
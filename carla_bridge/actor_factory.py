@@ -14,21 +14,33 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
 import itertools
 import logging
 import time
 
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
 try:
     import queue
 except ImportError:
     import Queue as queue
 
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
+from types import MappingProxyType
 from threading import Thread, Lock
 
 import carla
 
 from carla_bridge.actor_control import ActorControl
+from carla_bridge.actor_registry import ActorRegistry
+from carla_bridge.blueprint_catalog import BlueprintCatalog
+from carla_bridge.common.actor_index import ActorIndex
+from carla_bridge.common.frame_barrier import FrameBarrier
 from carla_bridge.ego_vehicle import EgoVehicle
 from carla_bridge.pseudo_actor import PseudoActor
 from carla_bridge.vehicle import Vehicle
@@ -40,9 +52,44 @@ from carla_bridge.imu import ImuSensor
 from carla_bridge.lidar import Lidar, SemanticLidar
 from carla_bridge.radar import Radar
 from carla_bridge.sensor import Sensor
+from carla_bridge.spawn_point_allocator import SpawnPointAllocator
 from carla_bridge.walker import Walker
 
 
+class ActorListView(Mapping):
+  """Live read only view on the latest published actors of a factory.
+
+  Each call works on the snapshot published at that time, the views
+  returned by keys, values and items stay on one snapshot.
+  """
+  def __init__(self, actor_factory):
+    self._actor_factory = actor_factory
+
+  def __getitem__(self, uid):
+    return self._actor_factory.actors[uid]
+
+  def __iter__(self):
+    return iter(self._actor_factory.actors)
+
+  def __len__(self):
+    return len(self._actor_factory.actors)
+
+  def __contains__(self, uid):
+    return uid in self._actor_factory.actors
+
+  def get(self, uid, default=None):
+    return self._actor_factory.actors.get(uid, default)
+
+  def keys(self):
+    return self._actor_factory.actors.keys()
+
+  def values(self):
+    return self._actor_factory.actors.values()
+
+  def items(self):
+    return self._actor_factory.actors.items()
+
+
 class ActorFactory(object):
   TIME_BETWEEN_UPDATES = 0.1
 
@@ -50,23 +97,48 @@ class ActorFactory(object):
     SPAWN_ACTOR = 0
     SPAWN_PSEUDO_ACTOR = 1
     DESTROY_ACTOR = 2
+    SPAWN_ACTORS = 3
 
-  def __init__(self, node, world, sync_mode=False):
+  def __init__(self, node, world, sync_mode=False, client=None):
     self.node = node
     self.world = world
-    self.blueprint_lib = self.world.get_blueprint_library()
+    self.client = client
+    self.blueprint_catalog = BlueprintCatalog(
+        self.world.get_blueprint_library,
+        version=getattr(self.node, "CARLA_VERSION", None),
+        cache_dir=self.node.parameters.get("blueprint_catalog_dir"))
     self.spawn_points = self.world.get_map().get_spawn_points()
+    self.spawn_point_allocator = SpawnPointAllocator(self.spawn_points)
     self.sync_mode = sync_mode
 
     self._active_actors = set()
-    self.actors = {}
+    # published read only snapshot of the actors, replaced as a whole on
+    # every structural change so the tick can iterate it without locking
+    self.actors = MappingProxyType({})
+    # working copy, only modified while holding self.lock
+    self._actors = {}
+    self._actors_changed = False
+    # removed objects, retired once a snapshot without them is published
+    self._removed_actors = []
+    # retired objects, destroyed once the tick no longer uses them
+    self._retired_actors = []
+    self.actor_list = ActorListView(self)
 
     self._task_queue = queue.Queue()
-    self._known_actor_ids = []
+    self._known_actor_ids = set()
+    self._actor_index = ActorIndex()
 
     self.lock = Lock()
+    self._retired_lock = Lock()
+    self._cleanup_executor = ThreadPoolExecutor(max_workers=1)
+    self.sensor_barrier = FrameBarrier(
+        min_timeout=self.node.parameters.get('sensor_timeout_min', 0.2),
+        max_timeout=self.node.parameters.get('sensor_timeout_max', 1.0))
     self.spawn_lock = Lock()
 
+    self.registry = ActorRegistry()
+    self._register_actor_types()
+
     self.id_gen = itertools.count(10000)
     self.thread = Thread(target=self._update_thread)
 
@@ -77,52 +149,124 @@ class ActorFactory(object):
   def _update_thread(self):
     while not self.node.shutdown.is_set():
       time.sleep(ActorFactory.TIME_BETWEEN_UPDATES)
-      self.world.wait_for_tick()
-      self.update_available_objects()
-
-  def update_available_objects(self):
-    current_actors = set([actor.id for actor in self.world.get_actors()])
+      world_snapshot = self.world.wait_for_tick()
+      self.update_available_objects(world_snapshot)
+
+  def update_available_objects(self, world_snapshot=None):
+    """Create and destroy objects for the actors spawned and destroyed in carla.
+
+    With a world snapshot the actor ids are taken from the snapshot, so
+    only newly spawned actors are requested from the server, all of them
+    with one call.
+    """
+    if world_snapshot is not None:
+      current_actors = set([actor_snapshot.id for actor_snapshot in world_snapshot])
+    else:
+      current_actors = set([actor.id for actor in self.world.get_actors()])
     spawned_actors = current_actors - self._active_actors
     destroyed_actors = self._active_actors - current_actors
     self._active_actors = current_actors
 
-    self.lock.acquire()
-    for actor_id in spawned_actors:
-      carla_actor = self.world.get_actor(actor_id)
-      if self.node.parameters["register_all_sensors"] or not isinstance(carla_actor, carla.Sensor):
-        self._create_object_from_actor(carla_actor)
-
-    for actor_id in destroyed_actors:
-      self._destroy_object(actor_id, delete_actor=False)
+    spawned_carla_actors = []
+    if spawned_actors:
+      spawned_carla_actors = self.world.get_actors(list(spawned_actors))
 
-    with self.spawn_lock:
-      while not self._task_queue.empty():
-        task = self._task_queue.get()
-        task_type = task[0]
-        actor_id, req = task[1]
-
-        if task_type == ActorFactory.TaskType.SPAWN_ACTOR and not self.node.shutdown.is_set():
-          carla_actor = self.world.get_actor(actor_id)
-          self._create_object_from_actor(carla_actor, req)
-        elif task_type == ActorFactory.TaskType.SPAWN_PSEUDO_ACTOR and not self.node.shutdown.is_set():
-          self._create_object(actor_id, req.type, req.id, req.attach_to, req.transform)
-        elif task_type == ActorFactory.TaskType.DESTROY_ACTOR:
-          self._destroy_object(actor_id, delete_actor=True)
-    self.lock.release()
-
-  def update_actor_states(self, frame, timestamp):
     with self.lock:
-      for actor_id in self.actors:
-        try:
-          self.actors[actor_id].update(frame, timestamp)
-        except RuntimeError as e:
-          logging.warn("Update actor {}({}) failed: {}".format(
-                        self.actors[actor_id].__class__.__name__, actor_id, e))
+      for carla_actor in spawned_carla_actors:
+        if self.node.parameters["register_all_sensors"] or not isinstance(carla_actor, carla.Sensor):
+          self._create_object_from_actor(carla_actor)
+
+      self._destroy_objects(destroyed_actors, delete_actor=False)
+
+      objects_to_destroy = []
+
+      with self.spawn_lock:
+        while not self._task_queue.empty():
+          task = self._task_queue.get()
+          task_type = task[0]
+
+          if task_type == ActorFactory.TaskType.SPAWN_ACTORS and not self.node.shutdown.is_set():
+            spawned = task[1]
+            carla_actors = dict((carla_actor.id, carla_actor) for carla_actor in
+                                self.world.get_actors([actor_id for actor_id, _ in spawned]))
+            for actor_id, req in spawned:
+              if actor_id in carla_actors:
+                self._create_object_from_actor(carla_actors[actor_id], req)
+            continue
+
+          if task_type == ActorFactory.TaskType.SPAWN_PSEUDO_ACTOR:
+            # attach_to of the request may refer to another request of a batch
+            actor_id, req, parent_id = task[1]
+            if not self.node.shutdown.is_set():
+              try:
+                self._create_object(actor_id, req.type, req.id, parent_id, req.transform)
+              except IndexError as e:
+                logging.warn("Create pseudo actor {} failed: {}".format(actor_id, e))
+            continue
+
+          actor_id, req = task[1]
+          if task_type == ActorFactory.TaskType.SPAWN_ACTOR and not self.node.shutdown.is_set():
+            carla_actor = self.world.get_actor(actor_id)
+            self._create_object_from_actor(carla_actor, req)
+          elif task_type == ActorFactory.TaskType.DESTROY_ACTOR:
+            objects_to_destroy.append(actor_id)
+        self._destroy_objects(objects_to_destroy, delete_actor=True)
+      self._publish_actors()
+
+    # after creating the objects, so the new actors are tracked
+    if world_snapshot is not None:
+      self.spawn_point_allocator.update(world_snapshot)
+
+  def _publish_actors(self):
+    if self._actors_changed:
+      self.actors = MappingProxyType(dict(self._actors))
+      self._actors_changed = False
+    if self._removed_actors:
+      with self._retired_lock:
+        self._retired_actors.extend(self._removed_actors)
+      self._removed_actors = []
+
+  def update_actor_states(self, frame, timestamp, tick_time=None):
+    # objects created or removed meanwhile show up in the next frame
+    actors = self.actors
+    waiting_sensors = {}
+    for actor_id, actor in actors.items():
+      if self.sync_mode and isinstance(actor, Sensor) and \
+          not actor.is_event_sensor and actor.is_data_expected(timestamp):
+        waiting_sensors[actor_id] = actor
+      else:
+        self._update_actor(actor, frame, timestamp)
+
+    # convert the data of each sensor as soon as it arrived
+    for actor in self.sensor_barrier.wait(frame, waiting_sensors, tick_time):
+      self._update_actor(actor, frame, timestamp)
+    if self.sensor_barrier.missing:
+      logging.warn("Timeout ({:.3f}s) while waiting for sensor data of frame {}: {}".format(
+          self.sensor_barrier.get_timeout(), frame,
+          [actor.uid for actor in self.sensor_barrier.missing]))
+      for actor in self.sensor_barrier.missing:
+        self._update_actor(actor, frame, timestamp)
+
+    self._reclaim_actors()
+
+  def _update_actor(self, actor, frame, timestamp):
+    try:
+      actor.update(frame, timestamp)
+    except RuntimeError as e:
+      logging.warn("Update actor {}({}) failed: {}".format(
+                    actor.__class__.__name__, actor.uid, e))
 
   def clear(self):
-    for _, actor in self.actors.items():
-      actor.destroy()
-    self.actors.clear()
+    with self.lock:
+      self._publish_actors()
+      self._reclaim_actors()
+      # wait for the destruction of removed objects to finish
+      self._cleanup_executor.shutdown(wait=True)
+      for _, actor in self._actors.items():
+        actor.destroy()
+      self._actors.clear()
+      self.actors = MappingProxyType({})
+      self._actor_index = ActorIndex()
 
   def spawn_actor(self, req):
     with self.spawn_lock:
@@ -132,63 +276,181 @@ class ActorFactory(object):
           if carla_actor is None:
             raise IndexError("Parent actor {} not found".format(req.attach_to))
         id_ = next(self.id_gen)
-        self._task_queue.put((ActorFactory.TaskType.SPAWN_PSEUDO_ACTOR, (id_, req)))
+        self._task_queue.put((ActorFactory.TaskType.SPAWN_PSEUDO_ACTOR,
+                              (id_, req, req.attach_to)))
       else:
         id_ = self._spawn_carla_actor(req)
         self._task_queue.put((ActorFactory.TaskType.SPAWN_ACTOR, (id_, req)))
-      self._known_actor_ids.append(id_)
+      self._known_actor_ids.add(id_)
     return id_
 
-  def destroy_actor(self, uid):
-    def get_objects_to_destroy(uid):
-      objects_to_destroy = []
-      if uid in self._known_actor_ids:
-        objects_to_destroy.append(uid)
-        self._known_actor_ids.remove(uid)
+  def spawn_actors(self, reqs):
+    """Spawn the actors of several requests with command batches.
 
-      # remove actors that have the actor to be removed as parent.
-      for actor in list(self.actors.values()):
-        if actor.parent is not None and actor.parent.uid == uid:
-          objects_to_destroy.extend(get_objects_to_destroy(actor.uid))
+    attach_to of a request may refer to the actor of an earlier request in
+    reqs as -(index + 1). Requests are spawned level by level, one batch
+    for all requests whose parent is known. Returns a (id, error) tuple per
+    request, id is None if the request failed.
+    """
+    if self.client is None:
+      raise RuntimeError("Spawning actors in batches requires a carla client")
 
-      return objects_to_destroy
+    results = [None] * len(reqs)
+    spawned_actors = []
+    spawned_pseudo_actors = []
 
     with self.spawn_lock:
-      objects_to_destroy = set(get_objects_to_destroy(uid))
+      existing_parents = set(req.attach_to for req in reqs if req.attach_to > 0)
+      if existing_parents:
+        existing_parents = set(carla_actor.id for carla_actor in
+                               self.world.get_actors(list(existing_parents)))
+
+      pending = list(range(len(reqs)))
+      while pending:
+        batch, waiting = [], []
+        for index in pending:
+          req = reqs[index]
+          parent_id = req.attach_to
+          if parent_id < 0:
+            parent_index = -parent_id - 1
+            if parent_index >= len(reqs) or parent_index == index:
+              results[index] = (None, "Invalid parent request {}".format(parent_index))
+              continue
+            if results[parent_index] is None:
+              waiting.append(index)
+              continue
+            parent_id = results[parent_index][0]
+            if parent_id is None:
+              results[index] = (None, "Parent request {} failed".format(parent_index))
+              continue
+          elif parent_id > 0 and parent_id not in existing_parents:
+            results[index] = (None, "Parent actor {} not found".format(parent_id))
+            continue
+
+          if "pseudo" in req.type:
+            id_ = next(self.id_gen)
+            spawned_pseudo_actors.append((id_, req, parent_id))
+            results[index] = (id_, "")
+            continue
+          try:
+            blueprint = self._get_spawn_blueprint(req)
+            transform, token = self._get_spawn_transform(req, blueprint)
+          except Exception as e:
+            results[index] = (None, str(e))
+            continue
+          if parent_id:
+            command = carla.command.SpawnActor(blueprint, transform, parent_id)
+          else:
+            command = carla.command.SpawnActor(blueprint, transform)
+          batch.append((index, command, token))
+
+        if batch:
+          try:
+            responses = self.client.apply_batch_sync([command for _, command, _ in batch])
+          except Exception as e:
+            # the actors of earlier batches are still registered below
+            for index, _, token in batch:
+              results[index] = (None, str(e))
+              self._release_spawn_point(token)
+            responses = []
+          for (index, _, token), response in zip(batch, responses):
+            if response.error:
+              results[index] = (None, response.error)
+              self._release_spawn_point(token)
+            else:
+              results[index] = (response.actor_id, "")
+              spawned_actors.append((response.actor_id, reqs[index]))
+              self._confirm_spawn_point(token, response.actor_id)
+        elif len(waiting) == len(pending):
+          # the remaining requests reference each other
+          for index in waiting:
+            results[index] = (None, "Cyclic parent requests")
+          waiting = []
+        pending = waiting
+
+      if spawned_actors:
+        self._task_queue.put((ActorFactory.TaskType.SPAWN_ACTORS, spawned_actors))
+      for id_, req, parent_id in spawned_pseudo_actors:
+        self._task_queue.put((ActorFactory.TaskType.SPAWN_PSEUDO_ACTOR, (id_, req, parent_id)))
+      for id_, _ in spawned_actors:
+        self._known_actor_ids.add(id_)
+      for id_, _, _ in spawned_pseudo_actors:
+        self._known_actor_ids.add(id_)
+    return results
+
+  def destroy_actor(self, uid):
+    return self.destroy_actors([uid])
+
+  def destroy_actors(self, uids):
+    """Destroy the actors and everything attached to them.
+
+    The carla actors of all of them are destroyed with one command batch
+    on the next update.
+    """
+    with self.spawn_lock:
+      # the actors themselves and all actors attached to them, directly or not
+      objects_to_destroy = set()
+      for uid in uids:
+        for obj in self._actor_index.subtree(uid):
+          if obj in self._known_actor_ids:
+            self._known_actor_ids.discard(obj)
+            objects_to_destroy.add(obj)
       for obj in objects_to_destroy:
         self._task_queue.put((ActorFactory.TaskType.DESTROY_ACTOR, (obj, None)))
     return objects_to_destroy
 
-  def _spawn_carla_actor(self, req):
+  def _get_spawn_blueprint(self, req):
     if "*" in req.type:
-      blueprint = secure_random.choice(
-                self.blueprint_lib.filter(req.type))
+      blueprint = self.blueprint_catalog.find(secure_random.choice(
+                self.blueprint_catalog.filter(req.type)))
     else:
-      blueprint = self.blueprint_lib.find(req.type)
+      blueprint = self.blueprint_catalog.find(req.type)
 
     blueprint.set_attribute('role_name', req.id)
     for attribute in req.attributes:
       blueprint.set_attribute(attribute.key, attribute.value)
+    return blueprint
+
+  def _get_spawn_transform(self, req, blueprint):
+    """Returns the transform and the token of the reserved spawn point."""
     if req.random_pose is False:
-      transform = trans.ros_pose_to_carla_transform(req.transform)
-    else:
-      transform = secure_random.choice(
-                self.spawn_points) if self.spawn_points else carla.Transform()
-
-    attach_to = None
-    if req.attach_to != 0:
-      attach_to = self.world.get_actor(req.attach_to)
-      if attach_to is None:
-        raise IndexError("Parent actor {} not found".format(req.attach_to))
-    carla_actor = self.world.spawn_actor(blueprint, transform, attach_to)
+      return trans.ros_pose_to_carla_transform(req.transform), None
+    if not self.spawn_points:
+      return carla.Transform(), None
+    token, transform = self.spawn_point_allocator.allocate(blueprint.id)
+    return transform, token
+
+  def _confirm_spawn_point(self, token, actor_id):
+    if token is not None:
+      self.spawn_point_allocator.confirm(token, actor_id)
+
+  def _release_spawn_point(self, token):
+    if token is not None:
+      self.spawn_point_allocator.release(token)
+
+  def _spawn_carla_actor(self, req):
+    blueprint = self._get_spawn_blueprint(req)
+    transform, token = self._get_spawn_transform(req, blueprint)
+
+    try:
+      attach_to = None
+      if req.attach_to != 0:
+        attach_to = self.world.get_actor(req.attach_to)
+        if attach_to is None:
+          raise IndexError("Parent actor {} not found".format(req.attach_to))
+      carla_actor = self.world.spawn_actor(blueprint, transform, attach_to)
+    except Exception:
+      self._release_spawn_point(token)
+      raise
+    self._confirm_spawn_point(token, carla_actor.id)
     return carla_actor.id
 
   def _create_object_from_actor(self, carla_actor, req=None):
     parent = None
     relative_transform = trans.carla_transform_to_ros_pose(carla_actor.get_transform())
     if carla_actor.parent:
-      if carla_actor.parent.id in self.actors:
-        parent = self.actors[carla_actor.parent.id]
+      if carla_actor.parent.id in self._actors:
+        parent = self._actors[carla_actor.parent.id]
       else:
         parent = self._create_object_from_actor(carla_actor.parent)
       if req is not None:
@@ -206,6 +468,10 @@ class ActorFactory(object):
     if parent is not None:
       parent_id = parent.uid
 
+    if carla_actor.type_id.startswith(("vehicle", "walker")):
+      self.spawn_point_allocator.track(carla_actor.id, carla_actor.type_id,
+                                       carla_actor.bounding_box.extent)
+
     name = carla_actor.attributes.get("role_name", "")
     if not name:
       name = str(carla_actor.id)
@@ -213,18 +479,52 @@ class ActorFactory(object):
                                   parent_id, relative_transform, carla_actor)
     return obj
 
-  def _destroy_object(self, actor_id, delete_actor):
-    if actor_id not in self.actors:
+  def _destroy_objects(self, actor_ids, delete_actor):
+    """Remove the objects, they are destroyed after the next tick."""
+    removed_actors = []
+    for actor_id in actor_ids:
+      actor = self._actors.pop(actor_id, None)
+      if actor is None:
+        continue
+      self._actor_index.remove(actor_id)
+      self.spawn_point_allocator.untrack(actor_id)
+      removed_actors.append(actor)
+    if removed_actors:
+      self._actors_changed = True
+      # the current snapshot may still contain them
+      self._removed_actors.append((removed_actors, delete_actor))
+
+  def _reclaim_actors(self):
+    # the published snapshot no longer contains the retired objects and
+    # the tick using the previous one finished, destroy them off the thread
+    with self._retired_lock:
+      retired, self._retired_actors = self._retired_actors, []
+    for removed_actors, delete_actor in retired:
+      self._cleanup_executor.submit(self._cleanup_objects, removed_actors, delete_actor)
+
+  def _cleanup_objects(self, actors, delete_actor):
+    carla_actors = []
+    for actor in actors:
+      if delete_actor and isinstance(actor, Actor) and actor.carla_actor is not None:
+        carla_actors.append(actor.carla_actor)
+      try:
+        actor.destroy()
+      except Exception as e:
+        logging.warn("Destroy {}(id={}) failed: {}".format(
+            actor.__class__.__name__, actor.uid, e))
+      logging.info("Removed {}(id={})".format(actor.__class__.__name__, actor.uid))
+
+    if not carla_actors:
+      return
+    if self.client is None:
+      for carla_actor in carla_actors:
+        carla_actor.destroy()
       return
-    actor = self.actors[actor_id]
-    del self.actors[actor_id]
-    carla_actor = None
-    if isinstance(actor, Actor):
-      carla_actor = actor.carla_actor
-    actor.destroy()
-    if carla_actor and delete_actor:
-      carla_actor.destroy()
-    logging.info("Removed {}(id={})".format(actor.__class__.__name__, actor.uid))
+    responses = self.client.apply_batch_sync(
+        [carla.command.DestroyActor(carla_actor.id) for carla_actor in carla_actors])
+    for carla_actor, response in zip(carla_actors, responses):
+      if response.error:
+        logging.warn("Destroy carla actor {} failed: {}".format(carla_actor.id, response.error))
 
   def get_pseudo_sensor_types(self):
     pseudo_sensors = []
@@ -233,132 +533,89 @@ class ActorFactory(object):
         pseudo_sensors.append(cls.get_blueprint_name())
     return pseudo_sensors
 
+  def _register_actor_types(self):
+    node = self.node
+    sync_mode = self.sync_mode
+    register = self.registry.register
+
+    def pseudo_actor(cls, **kwargs):
+      return lambda uid, name, parent, spawn_pose, carla_actor: cls(
+          uid=uid, name=name, parent=parent, node=node, **kwargs)
+
+    def actor(cls):
+      return lambda uid, name, parent, spawn_pose, carla_actor: cls(
+          uid, name, parent, node, carla_actor)
+
+    def sensor(cls):
+      return lambda uid, name, parent, spawn_pose, carla_actor: cls(
+          uid, name, parent, spawn_pose, node, carla_actor, sync_mode)
+
+    def vehicle(uid, name, parent, spawn_pose, carla_actor):
+      if carla_actor.attributes.get('role_name') \
+              in node.parameters['ego_vehicle']['role_name']:
+        return EgoVehicle(uid, name, parent, node, carla_actor,
+                          node._ego_vehicle_control_applied_callback,
+                          node._ego_vehicle_control_received_callback)
+      return Vehicle(uid, name, parent, node, carla_actor)
+
+    register(TFSensor.get_blueprint_name(), pseudo_actor(TFSensor), exact=True)
+    register(OdometrySensor.get_blueprint_name(), pseudo_actor(OdometrySensor), exact=True)
+    register(SpeedometerSensor.get_blueprint_name(), pseudo_actor(SpeedometerSensor), exact=True)
+    register(MarkerSensor.get_blueprint_name(),
+             pseudo_actor(MarkerSensor, actor_list=self.actor_list, world=self.world), exact=True)
+    register(ActorListSensor.get_blueprint_name(),
+             pseudo_actor(ActorListSensor, actor_list=self.actor_list), exact=True)
+    register(ObjectSensor.get_blueprint_name(),
+             pseudo_actor(ObjectSensor, actor_list=self.actor_list), exact=True)
+    register(TrafficLightsSensor.get_blueprint_name(),
+             pseudo_actor(TrafficLightsSensor, actor_list=self.actor_list), exact=True)
+    register(OpenDriveSensor.get_blueprint_name(),
+             pseudo_actor(OpenDriveSensor, carla_map=self.world.get_map()), exact=True)
+    register(ActorControl.get_blueprint_name(), pseudo_actor(ActorControl), exact=True)
+
+    register("", actor(Actor))
+    register("traffic", actor(Traffic))
+    register("traffic.traffic_light", actor(TrafficLight))
+    register("vehicle", vehicle)
+    register("sensor", sensor(Sensor))
+    register("sensor.camera", sensor(Camera))
+    register("sensor.camera.rgb", sensor(RgbCamera))
+    register("sensor.camera.depth", sensor(DepthCamera))
+    register("sensor.camera.semantic_segmentation", sensor(SemanticSegmentationCamera))
+    register("sensor.camera.dvs", sensor(DVSCamera))
+    register("sensor.lidar.ray_cast", sensor(Lidar))
+    register("sensor.lidar.ray_cast_semantic", sensor(SemanticLidar))
+    register("sensor.other.radar", sensor(Radar))
+    register("sensor.other.gnss", sensor(Gnss))
+    register("sensor.other.imu", sensor(ImuSensor))
+    register("sensor.other.collision", sensor(CollisionSensor))
+    register("sensor.other.rss", sensor(RssSensor))
+    register("sensor.other.lane_invasion", sensor(LaneInvasionSensor))
+    register("spectator", actor(Spectator))
+    register("walker", actor(Walker))
+
+    self.registry.load_entry_points(self)
+
   def _create_object(self, uid, type_id, name, attach_to, spawn_pose, carla_actor=None):
-    if carla_actor is not None and carla_actor.id in self.actors:
+    if carla_actor is not None and carla_actor.id in self._actors:
       return None
 
     if attach_to != 0:
-      if attach_to not in self.actors:
+      if attach_to not in self._actors:
         raise IndexError("Parent object {} not found".format(attach_to))
-      parent = self.actors[attach_to]
+      parent = self._actors[attach_to]
     else:
       parent = None
 
-    if type_id == TFSensor.get_blueprint_name():
-      actor = TFSensor(uid=uid, name=name, parent=parent, node=self.node)
-    elif type_id == OdometrySensor.get_blueprint_name():
-      actor = OdometrySensor(uid=uid,
-                             name=name,
-                             parent=parent,
-                             node=self.node)
-    elif type_id == SpeedometerSensor.get_blueprint_name():
-      actor = SpeedometerSensor(uid=uid,
-                                name=name,
-                                parent=parent,
-                                node=self.node)
-    elif type_id == MarkerSensor.get_blueprint_name():
-      actor = MarkerSensor(uid=uid,
-                           name=name,
-                           parent=parent,
-                           node=self.node,
-                           actor_list=self.actors,
-                           world=self.world)
-    elif type_id == ActorListSensor.get_blueprint_name():
-      actor = ActorListSensor(uid=uid,
-                              name=name,
-                              parent=parent,
-                              node=self.node,
-                              actor_list=self.actors)
-    elif type_id == ObjectSensor.get_blueprint_name():
-      actor = ObjectSensor(uid=uid,
-                           name=name,
-                           parent=parent,
-                           node=self.node,
-                           actor_list=self.actors)
-    elif type_id == TrafficLightsSensor.get_blueprint_name():
-      actor = TrafficLightsSensor(uid=uid,
-                                  name=name,
-                                  parent=parent,
-                                  node=self.node,
-                                  actor_list=self.actors)
-    elif type_id == OpenDriveSensor.get_blueprint_name():
-      actor = OpenDriveSensor(uid=uid,
-                              name=name,
-                              parent=parent,
-                              node=self.node,
-                              carla_map=self.world.get_map())
-    elif type_id == ActorControl.get_blueprint_name():
-      actor = ActorControl(uid=uid,
-                           name=name,
-                           parent=parent,
-                           node=self.node)
-    elif carla_actor.type_id.startswith('traffic'):
-      if carla_actor.type_id == "traffic.traffic_light":
-        actor = TrafficLight(uid, name, parent, self.node, carla_actor)
-      else:
-        actor = Traffic(uid, name, parent, self.node, carla_actor)
-    elif carla_actor.type_id.startswith("vehicle"):
-      if carla_actor.attributes.get('role_name') \
-              in self.node.parameters['ego_vehicle']['role_name']:
-        actor = EgoVehicle(uid, name, parent, self.node, carla_actor,
-                    self.node._ego_vehicle_control_applied_callback)
-      else:
-        actor = Vehicle(uid, name, parent, self.node, carla_actor)
-    elif carla_actor.type_id.startswith("sensor"):
-      if carla_actor.type_id.startswith("sensor.camera"):
-          if carla_actor.type_id.startswith("sensor.camera.rgb"):
-            actor = RgbCamera(uid, name, parent, spawn_pose, self.node,
-                              carla_actor, self.sync_mode)
-          elif carla_actor.type_id.startswith("sensor.camera.depth"):
-            actor = DepthCamera(uid, name, parent, spawn_pose,
-                                self.node, carla_actor, self.sync_mode)
-          elif carla_actor.type_id.startswith(
-                  "sensor.camera.semantic_segmentation"):
-            actor = SemanticSegmentationCamera(uid, name, parent,
-                                               spawn_pose, self.node,
-                                               carla_actor, self.sync_mode)
-          elif carla_actor.type_id.startswith("sensor.camera.dvs"):
-            actor = DVSCamera(uid, name, parent, spawn_pose, self.node,
-                              carla_actor, self.sync_mode)
-          else:
-            actor = Camera(uid, name, parent, spawn_pose, self.node,
-                           carla_actor, self.sync_mode)
-      elif carla_actor.type_id.startswith("sensor.lidar"):
-        if carla_actor.type_id.endswith("sensor.lidar.ray_cast"):
-          actor = Lidar(uid, name, parent, spawn_pose, self.node,
-                        carla_actor, self.sync_mode)
-        elif carla_actor.type_id.endswith("sensor.lidar.ray_cast_semantic"):
-          actor = SemanticLidar(uid, name, parent, spawn_pose,
-                                self.node, carla_actor, self.sync_mode)
-      elif carla_actor.type_id.startswith("sensor.other.radar"):
-        actor = Radar(uid, name, parent, spawn_pose, self.node,
-                        carla_actor, self.sync_mode)
-      elif carla_actor.type_id.startswith("sensor.other.gnss"):
-        actor = Gnss(uid, name, parent, spawn_pose, self.node,
-                        carla_actor, self.sync_mode)
-      elif carla_actor.type_id.startswith("sensor.other.imu"):
-        actor = ImuSensor(uid, name, parent, spawn_pose, self.node,
-                          carla_actor, self.sync_mode)
-      elif carla_actor.type_id.startswith("sensor.other.collision"):
-        actor = CollisionSensor(uid, name, parent, spawn_pose,
-                                self.node, carla_actor, self.sync_mode)
-      elif carla_actor.type_id.startswith("sensor.other.rss"):
-        actor = RssSensor(uid, name, parent, spawn_pose, self.node,
-                          carla_actor, self.sync_mode)
-      elif carla_actor.type_id.startswith("sensor.other.lane_invasion"):
-        actor = LaneInvasionSensor(uid, name, parent, spawn_pose,
-                                   self.node, carla_actor, self.sync_mode)
-      else:
-        actor = Sensor(uid, name, parent, spawn_pose, self.node,
-                       carla_actor, self.sync_mode)
-    elif carla_actor.type_id.startswith("spectator"):
-      actor = Spectator(uid, name, parent, self.node, carla_actor)
-    elif carla_actor.type_id.startswith("walker"):
-      actor = Walker(uid, name, parent, self.node, carla_actor)
-    else:
-      actor = Actor(uid, name, parent, self.node, carla_actor)
+    actor_type = self.registry.resolve(type_id)
+    actor = actor_type(uid, name, parent, spawn_pose, carla_actor)
+
+    if isinstance(actor, Sensor):
+      actor.buffer.listener = functools.partial(self.sensor_barrier.notify, actor.uid)
 
-    self.actors[actor.uid] = actor
+    self._actors[actor.uid] = actor
+    self._actors_changed = True
+    self._actor_index.add(actor.uid, parent.uid if parent is not None else None)
     logging.info("Created {}(id={})".format(actor.__class__.__name__, actor.uid))
 
     return actor
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+# Copyright 2022 daohu527 <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Map blueprint ids to the classes wrapping the carla actors
+"""
+
+import logging
+
+from threading import Lock
+
+try:
+  from importlib.metadata import entry_points
+except ImportError:
+  entry_points = None
+
+
+class ActorRegistry(object):
+  """Resolve a blueprint id to the factory creating its wrapper.
+
+  Factories are registered for an exact blueprint id or for a blueprint
+  prefix, the longest registered prefix wins. Prefixes are kept in a
+  character trie and each resolved id is cached, so resolving is a dict
+  lookup after the first actor of a type.
+
+  A factory is called as factory(uid, name, parent, spawn_pose, carla_actor).
+  """
+  ENTRY_POINT_GROUP = "carla_bridge.actors"
+
+  _END = object()
+
+  def __init__(self):
+    self._exact = {}
+    self._trie = {}
+    self._cache = {}
+    self._lock = Lock()
+
+  def register(self, blueprint, factory, exact=False):
+    with self._lock:
+      if exact:
+        self._exact[blueprint] = factory
+      else:
+        node = self._trie
+        for char in blueprint:
+          node = node.setdefault(char, {})
+        node[ActorRegistry._END] = factory
+      self._cache.clear()
+
+  def resolve(self, type_id):
+    factory = self._cache.get(type_id)
+    if factory is not None:
+      return factory
+
+    with self._lock:
+      factory = self._exact.get(type_id)
+      if factory is None:
+        node = self._trie
+        factory = node.get(ActorRegistry._END)
+        for char in type_id:
+          node = node.get(char)
+          if node is None:
+            break
+          factory = node.get(ActorRegistry._END, factory)
+      if factory is None:
+        raise KeyError("No actor type registered for '{}'".format(type_id))
+      self._cache[type_id] = factory
+    return factory
+
+  def load_entry_points(self, *args):
+    """Let installed packages register their own wrappers.
+
+    Each entry point in the carla_bridge.actors group refers to a function
+    called with this registry followed by args.
+    """
+    if entry_points is None:
+      return
+    eps = entry_points()
+    if hasattr(eps, "select"):
+      eps = eps.select(group=ActorRegistry.ENTRY_POINT_GROUP)
+    else:
+      eps = eps.get(ActorRegistry.ENTRY_POINT_GROUP, [])
+    for entry_point in eps:
+      try:
+        entry_point.load()(self, *args)
+        logging.info("Registered actor types of '{}'".format(entry_point.name))
+      except Exception as e:
+        logging.warn("Load actor types of '{}' failed: {}".format(entry_point.name, e))
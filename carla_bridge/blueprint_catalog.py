@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+# Copyright 2022 daohu527 <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Index of the carla blueprint library
+"""
+
+import fnmatch
+import logging
+
+from threading import Lock
+
+import carla_bridge.common.json_cache as json_cache
+
+
+class BlueprintCatalog(object):
+  """Blueprint ids indexed by id and by tag.
+
+  Wildcard patterns are matched like BlueprintLibrary.filter, against the
+  id and the tags, and the matching ids are memoized per pattern. With a
+  cache_dir the ids and tags are stored per carla version, so later
+  starts skip enumerating the library. get_blueprint_library is only
+  called once the library is needed, for the first blueprint object or
+  for an id missing in a stale cache, which refreshes the cache.
+  """
+  def __init__(self, get_blueprint_library, version=None, cache_dir=None):
+    self._get_blueprint_library = get_blueprint_library
+    self._blueprint_lib = None
+    self._matches = {}
+    self._lock = Lock()
+    self._library_lock = Lock()
+
+    self._cache_file = json_cache.get_cache_file(cache_dir, "blueprints", version)
+    tags = json_cache.load(self._cache_file) if self._cache_file else None
+    if tags is None:
+      self._refresh()
+    else:
+      self._index(tags)
+
+  def __contains__(self, blueprint_id):
+    return blueprint_id in self._tags
+
+  def find(self, blueprint_id):
+    """Return a new blueprint, which can be modified freely."""
+    if blueprint_id not in self._tags:
+      # the library raises IndexError if it does not have it either
+      blueprint = self._get_library().find(blueprint_id)
+      logging.info("Blueprint '{}' missing in the catalog, refreshing it".format(blueprint_id))
+      with self._lock:
+        self._refresh()
+      return blueprint
+    return self._get_library().find(blueprint_id)
+
+  def get_ids_by_tag(self, tag):
+    return list(self._ids_by_tag.get(tag, ()))
+
+  def filter(self, pattern):
+    """Ids of the blueprints whose id or one of its tags matches pattern."""
+    with self._lock:
+      matches = self._matches.get(pattern)
+      if matches is None and not any(char in pattern for char in "*?["):
+        matches = sorted(set(self._ids_by_tag.get(pattern, [])) |
+                         (set([pattern]) if pattern in self._tags else set()))
+        self._matches[pattern] = matches
+      elif matches is None:
+        matches = sorted(blueprint_id for blueprint_id, tags in self._tags.items()
+                         if fnmatch.fnmatchcase(blueprint_id, pattern) or
+                         any(fnmatch.fnmatchcase(tag, pattern) for tag in tags))
+        self._matches[pattern] = matches
+      return matches
+
+  def _get_library(self):
+    # the library is held locally once fetched, its find() copies a blueprint
+    with self._library_lock:
+      if self._blueprint_lib is None:
+        self._blueprint_lib = self._get_blueprint_library()
+      return self._blueprint_lib
+
+  def _index(self, tags):
+    ids_by_tag = {}
+    for blueprint_id, blueprint_tags in tags.items():
+      for tag in blueprint_tags:
+        ids_by_tag.setdefault(tag, []).append(blueprint_id)
+    self._tags = tags
+    self._ids_by_tag = ids_by_tag
+    self._matches = {}
+
+  def _refresh(self):
+    """Enumerate the library again and store it in the cache."""
+    self._index(dict((blueprint.id, list(blueprint.tags))
+                     for blueprint in self._get_library()))
+    if self._cache_file:
+      json_cache.save(self._cache_file, self._tags)
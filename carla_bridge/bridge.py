@@ -14,10 +14,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from threading import Thread, Lock, Event
+from threading import Thread, Event
 
 import os
 import sys
+import time
 import logging
 
 try:
@@ -31,11 +32,22 @@ import carla
 import cyber_time
 import cyber
 
+from carla_msgs.msg import CarlaControlLatency
+
 from carla_bridge.compatible_node import CompatibleNode
 from carla_bridge.actor_factory import ActorFactory
 from carla_bridge.world_info import WorldInfo
 from carla_bridge.debug_helper import DebugHelper
+from carla_bridge.image_compressor import CompressedImagePublisher
+from carla_bridge.obstacle_publisher import ObstaclePublisher
 from carla_bridge.carla_status_publisher import CarlaStatusPublisher
+from carla_bridge.common.actor_state_cache import ActorStateCache
+from carla_bridge.common.control_barrier import ControlBarrier
+from carla_bridge.control_mailbox import ControlMailbox
+from carla_bridge.crowd_control import CrowdControl
+from carla_bridge.tf_publisher import TFPublisher
+from carla_bridge.trajectory_injector import TrajectoryInjector
+from carla_bridge.vehicle_info_cache import VehicleInfoCache
 
 
 class CarlaCyberBridge(CompatibleNode):
@@ -47,8 +59,9 @@ class CarlaCyberBridge(CompatibleNode):
   def __init__(self):
     super(CarlaCyberBridge, self).__init__()
 
-  def initialize_bridge(self, carla_world, params):
+  def initialize_bridge(self, carla_world, params, carla_client=None):
     self.carla_world = carla_world
+    self.carla_client = carla_client
     self.parameters = params
 
     self.cyber_timestamp = cyber_time.Time.now()
@@ -83,8 +96,23 @@ class CarlaCyberBridge(CompatibleNode):
 
       self.carla_control_queue = queue.Queue()
 
+      self.tf_publisher = TFPublisher(
+          self, static_period=self.parameters.get("tf_static_period", 1.0))
+      self.actor_state_cache = ActorStateCache()
+      self.control_mailbox = ControlMailbox(carla_client)
+      self.vehicle_info_cache = VehicleInfoCache(
+          version=self.CARLA_VERSION,
+          cache_dir=self.parameters.get("vehicle_info_cache_dir"))
+
       # actor factory
-      self.actor_factory = ActorFactory(self, carla_world, self.sync_mode)
+      self.actor_factory = ActorFactory(self, carla_world, self.sync_mode, carla_client)
+
+      self.crowd_control = CrowdControl(self.actor_factory, self)
+      self.trajectory_injector = TrajectoryInjector(self.actor_factory, self, carla_client)
+      self.obstacle_publisher = None
+      if self.parameters.get("publish_ground_truth_obstacles", False):
+        self.obstacle_publisher = ObstaclePublisher(
+            self.actor_factory, self, self.parameters.get("obstacle_radius", 100.0))
 
       # add world info
       self.world_info = WorldInfo(carla_world, self)
@@ -99,15 +127,25 @@ class CarlaCyberBridge(CompatibleNode):
           self.carla_settings.fixed_delta_seconds,
           self)
 
-      self._all_vehicle_control_commands_received = Event()
-      self._expected_ego_vehicle_control_command_ids = []
-      self._expected_ego_vehicle_control_command_ids_lock = Lock()
+      self.control_barrier = ControlBarrier(
+          min_timeout=self.parameters.get("vehicle_control_timeout_min", 0.05),
+          max_timeout=self.parameters.get("vehicle_control_timeout_max",
+                                          CarlaCyberBridge.VEHICLE_CONTROL_TIMEOUT))
+      self._control_latency_published = None
+      self.control_latency_publisher = self.node.create_writer(
+          "/carla/control_latency", CarlaControlLatency, 10)
 
       self.carla_weather_subscriber = self.node.create_reader(
           "/carla/weather_control",
           CarlaWeatherParameters,
           self.on_weather_changed)
 
+      self.spawn_objects_service = self.node.create_service(
+          "/carla/spawn_objects",
+          SpawnObjectsRequest,
+          SpawnObjectsResponse,
+          self.spawn_objects)
+
 
   def on_weather_changed(self, weather_parameters):
     """
@@ -129,6 +167,30 @@ class CarlaCyberBridge(CompatibleNode):
     weather.sun_altitude_angle = weather_parameters.sun_altitude_angle
     self.carla_world.set_weather(weather)
 
+  def spawn_objects(self, req):
+    """
+    Callback of the bulk spawn service, returns one id per request, -1 and
+    an error string for the requests that failed
+    :return:
+    """
+    response = SpawnObjectsResponse()
+    if self.shutdown.is_set():
+      return response
+    try:
+      results = self.actor_factory.spawn_actors(req.requests)
+    except Exception as e:
+      logging.warn("Error spawning objects: {}".format(e))
+      results = [(None, str(e))] * len(req.requests)
+
+    for id_, error in results:
+      if id_ is None:
+        response.ids.append(-1)
+      else:
+        self._registered_actors.append(id_)
+        response.ids.append(id_)
+      response.error_strings.append(error)
+    return response
+
   def process_run_state(self):
     command = None
     while not self.carla_control_queue.empty():
@@ -151,33 +213,38 @@ class CarlaCyberBridge(CompatibleNode):
         return
 
   def _synchronous_mode_update(self):
+    # actors are discovered from the snapshot of the previous tick
+    world_snapshot = None
     while not self.shutdown.is_set() and cyber.ok():
       self.process_run_state()
-      if self.parameters['synchronous_mode_wait_for_vehicle_control_command']:
-        self._expected_ego_vehicle_control_command_ids = []
-        with self._expected_ego_vehicle_control_command_ids_lock:
-          for actor_id, actor in self.actor_factory.actors.items():
-            if isinstance(actor, EgoVehicle):
-              self._expected_ego_vehicle_control_command_ids.append(actor_id)
-      self.actor_factory.update_available_objects()
+      ego_vehicle_ids = [actor_id for actor_id, actor in self.actor_factory.actors.items()
+                         if isinstance(actor, EgoVehicle)]
+      self.actor_factory.update_available_objects(world_snapshot)
+      self.control_mailbox.flush()
+      self.trajectory_injector.flush()
       frame = self.carla_world.tick()
+      tick_time = time.monotonic()
 
       world_snapshot = self.carla_world.get_snapshot()
 
       self.status_publisher.set_frame(frame)
       self.update_clock(world_snapshot.timestamp)
+      # commands answering this frame may arrive as soon as it is published
+      if self.parameters['synchronous_mode_wait_for_vehicle_control_command']:
+        self.control_barrier.begin(frame, ego_vehicle_ids)
       logging.debug("Tick for frame {} returned. Waiting for sensor data...".format(
                 frame))
-      self._update(frame, world_snapshot.timestamp.elapsed_seconds)
+      self._update(frame, world_snapshot.timestamp.elapsed_seconds, world_snapshot, tick_time)
       logging.debug("Waiting for sensor data finished.")
 
       if self.parameters['synchronous_mode_wait_for_vehicle_control_command']:
-        if self._expected_ego_vehicle_control_command_ids:
-          if not self._all_vehicle_control_commands_received.wait(CarlaCyberBridge.VEHICLE_CONTROL_TIMEOUT):
-            logging.warn("Timeout ({}s) while waiting for vehicle control commands. "
-                                     "Missing command from actor ids {}".format(CarlaCyberBridge.VEHICLE_CONTROL_TIMEOUT,
-                                                                                self._expected_ego_vehicle_control_command_ids))
-          self._all_vehicle_control_commands_received.clear()
+        # the deadlines of the egos count from the end of publishing
+        self.control_barrier.start()
+        missing = self.control_barrier.wait()
+        if missing:
+          logging.warn("Timeout while waiting for vehicle control commands of frame {}. "
+                       "Missing command from actor ids {}".format(frame, missing))
+        self.publish_control_latencies()
 
   def _carla_time_tick(self, carla_snapshot):
     if not self.shutdown.is_set():
@@ -186,25 +253,67 @@ class CarlaCyberBridge(CompatibleNode):
         self.update_clock(carla_snapshot.timestamp)
         self.status_publisher.set_frame(carla_snapshot.frame)
         self._update(carla_snapshot.frame,
-                      carla_snapshot.timestamp.elapsed_seconds)
-
-  def _update(self, frame, timestamp):
+                      carla_snapshot.timestamp.elapsed_seconds,
+                      carla_snapshot)
+        self.control_mailbox.flush()
+        self.trajectory_injector.flush()
+
+  def _update(self, frame, timestamp, world_snapshot=None, tick_time=None):
+    if world_snapshot is not None:
+      self.actor_state_cache.update(world_snapshot)
     self.world_info.update(frame, timestamp)
-    self.actor_factory.update_actor_states(frame, timestamp)
+    self.actor_factory.update_actor_states(frame, timestamp, tick_time)
+    if self.obstacle_publisher is not None and world_snapshot is not None:
+      self.obstacle_publisher.update(world_snapshot, timestamp)
+    self.tf_publisher.flush()
 
-  def _ego_vehicle_control_applied_callback(self, ego_vehicle_id):
+  def _ego_vehicle_control_received_callback(self, ego_vehicle_id, frame=None):
+    """
+    Called for each control command of an ego vehicle, returns False if the
+    command answers an older frame and has to be dropped
+    :return:
+    """
+    if not self.sync_mode or \
+        not self.parameters['synchronous_mode_wait_for_vehicle_control_command']:
+      return True
+    if not self.control_barrier.accept(frame):
+      logging.warn("Stale vehicle control command of frame {} received from {}".format(
+          frame, ego_vehicle_id))
+      return False
+    return True
+
+  def _ego_vehicle_control_applied_callback(self, ego_vehicle_id, frame=None):
+    """
+    Called after the control command of an ego vehicle was posted
+    :return:
+    """
     if not self.sync_mode or \
         not self.parameters['synchronous_mode_wait_for_vehicle_control_command']:
       return
-    with self._expected_ego_vehicle_control_command_ids_lock:
-      if ego_vehicle_id in self._expected_ego_vehicle_control_command_ids:
-        self._expected_ego_vehicle_control_command_ids.remove(
-                    ego_vehicle_id)
-      else:
-        logging.warn(
-                    "Unexpected vehicle control command received from {}".format(ego_vehicle_id))
-      if not self._expected_ego_vehicle_control_command_ids:
-        self._all_vehicle_control_commands_received.set()
+    self.control_barrier.arrive(ego_vehicle_id, frame)
+
+  def publish_control_latencies(self, force=False):
+    now = time.monotonic()
+    if not force and self._control_latency_published is not None and \
+        now - self._control_latency_published < self.parameters.get("control_latency_period", 1.0):
+      return
+    self._control_latency_published = now
+    latency_msg = CarlaControlLatency()
+    latency_msg.header.timestamp_sec = self.get_time()
+    latency_msg.bucket_bounds.extend(ControlBarrier.BUCKETS)
+    for ego_vehicle_id, counts in sorted(self.control_barrier.get_histograms().items()):
+      histogram = latency_msg.histograms.add()
+      histogram.ego_vehicle_id = ego_vehicle_id
+      histogram.counts.extend(counts)
+    latency_msg.rejected = self.control_barrier.rejected
+    self.control_latency_publisher.write(latency_msg)
+
+  def log_control_latencies(self):
+    buckets = ["<={}ms".format(int(bound * 1000)) for bound in ControlBarrier.BUCKETS]
+    buckets.append(">{}ms".format(int(ControlBarrier.BUCKETS[-1] * 1000)))
+    for ego_vehicle_id, counts in sorted(self.control_barrier.get_histograms().items()):
+      logging.info("Control latency of {}: {}".format(ego_vehicle_id, ", ".join(
+          "{} {}".format(bucket, count) for bucket, count in zip(buckets, counts) if count)))
 
   def update_clock(self, carla_timestamp):
     if cyber.ok():
@@ -221,17 +330,20 @@ class CarlaCyberBridge(CompatibleNode):
     else:
       self.synchronous_mode_update_thread.join()
     logging.info("Object update finished.")
+    self.control_mailbox.log_stats()
+    self.log_control_latencies()
     self.debug_helper.destroy()
     self.status_publisher.destroy()
     self.destroy_service(self.spawn_object_service)
+    self.destroy_service(self.spawn_objects_service)
     self.destroy_service(self.destroy_object_service)
     self.destroy_subscription(self.carla_weather_subscriber)
     self.carla_control_queue.put(CarlaControl.STEP_ONCE)
 
-    for uid in self._registered_actors:
-      self.actor_factory.destroy_actor(uid)
+    self.actor_factory.destroy_actors(self._registered_actors)
     self.actor_factory.update_available_objects()
     self.actor_factory.clear()
+    CompressedImagePublisher.shutdown()
     # todo(zero):
     # super(CarlaCyberBridge, self).destroy()
 
@@ -263,6 +375,36 @@ def main(args=None):
                                                               0.05)
   parameters['register_all_sensors'] = carla_bridge.get_param('register_all_sensors', True)
   parameters['town'] = carla_bridge.get_param('town', 'Town01')
+  parameters['blueprint_catalog_dir'] = carla_bridge.get_param(
+      'blueprint_catalog_dir', os.path.expanduser("~/.cache/carla_bridge"))
+  parameters['publish_ground_truth_obstacles'] = carla_bridge.get_param(
+      'publish_ground_truth_obstacles', False)
+  parameters['obstacle_radius'] = carla_bridge.get_param('obstacle_radius', 100.0)
+  parameters['walker_control_readers'] = carla_bridge.get_param('walker_control_readers', True)
+  parameters['vehicle_control_timeout_min'] = carla_bridge.get_param(
+      'vehicle_control_timeout_min', 0.05)
+  parameters['vehicle_control_timeout_max'] = carla_bridge.get_param(
+      'vehicle_control_timeout_max', CarlaCyberBridge.VEHICLE_CONTROL_TIMEOUT)
+  parameters['tf_static_period'] = carla_bridge.get_param('tf_static_period', 1.0)
+  parameters['control_latency_period'] = carla_bridge.get_param('control_latency_period', 1.0)
+  parameters['vehicle_info_cache_dir'] = carla_bridge.get_param(
+      'vehicle_info_cache_dir', os.path.expanduser("~/.cache/carla_bridge"))
+  parameters['sensor_buffer_size'] = carla_bridge.get_param('sensor_buffer_size', 8)
+  parameters['sensor_buffer_policy'] = carla_bridge.get_param('sensor_buffer_policy', 'drop_oldest')
+  parameters['sensor_timeout_min'] = carla_bridge.get_param('sensor_timeout_min', 0.2)
+  parameters['sensor_timeout_max'] = carla_bridge.get_param('sensor_timeout_max', 1.0)
+  parameters['semantic_lidar_split_tags'] = carla_bridge.get_param(
+      'semantic_lidar_split_tags', False)
+  parameters['depth_camera_16bit'] = carla_bridge.get_param('depth_camera_16bit', False)
+  parameters['camera_image_encoding'] = carla_bridge.get_param('camera_image_encoding', 'bgra8')
+  parameters['camera_compressed_format'] = carla_bridge.get_param('camera_compressed_format', '')
+  parameters['camera_compressed_quality'] = carla_bridge.get_param('camera_compressed_quality', 90)
+  parameters['camera_compression_workers'] = carla_bridge.get_param('camera_compression_workers', 2)
+  parameters['camera_compression_use_processes'] = carla_bridge.get_param(
+      'camera_compression_use_processes', False)
+  parameters['camera_compression_max_in_flight'] = carla_bridge.get_param(
+      'camera_compression_max_in_flight', 2)
+  parameters['dvs_event_frame_decay'] = carla_bridge.get_param('dvs_event_frame_decay', 0.)
   role_name = carla_bridge.get_param('ego_vehicle_role_name',
                                       ["hero", "ego_vehicle", "hero1", "hero2", "hero3"])
   parameters["ego_vehicle"] = {"role_name": role_name}
@@ -306,7 +448,7 @@ def main(args=None):
           carla_world = carla_client.load_world(parameters["town"])
       carla_world.tick()
 
-    carla_bridge.initialize_bridge(carla_client.get_world(), parameters)
+    carla_bridge.initialize_bridge(carla_client.get_world(), parameters, carla_client)
 
     carla_bridge.node.spin()
 
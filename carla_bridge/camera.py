@@ -14,10 +14,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import logging
+
 import numpy as np
+import transforms3d
 
 import carla
 
+import carla_bridge.common.point_cloud as pc
+
+from carla_bridge.common.buffer_pool import BufferPool
+
+from carla_bridge.image_compressor import CompressedImagePublisher
 from carla_bridge.sensor import Sensor
 
 from modules.drivers.proto.sensor_image_pb2 import Image
@@ -25,6 +33,16 @@ from modules.drivers.proto.sensor_image_pb2 import Image
 class Camera(Sensor):
   cv_bridge = CvBridge()
 
+  # encodings converted from bgra8 without going through cv_bridge
+  NATIVE_ENCODINGS = ('bgra8', 'rgb8', 'bgr8', 'mono8')
+  # BT.601 luma weights of b, g, r scaled by 256
+  MONO_WEIGHTS = (29, 150, 77)
+  # rotation from the carla camera frame to the optical frame
+  QUAT_SWAP = transforms3d.quaternions.mat2quat(
+      np.array([[0, 0, 1],
+                [-1, 0, 0],
+                [0, -1, 0]]))
+
   def __init__(self, uid, name, parent, relative_spawn_pose, node, carla_actor,
       synchronous_mode, is_event_sensor=False):
     super(Camera, self).__init__(uid=uid,
@@ -45,8 +63,23 @@ class Camera(Sensor):
     self.camera_image_publisher = node.create_writer(
         self.get_topic_prefix() + "/image", Image, 10)
 
+    self.image_encoding = node.parameters.get('camera_image_encoding', 'bgra8')
+    self._buffer_pool = BufferPool()
+
+    self.compressed_image_publisher = None
+    image_format = node.parameters.get('camera_compressed_format', '')
+    if image_format:
+      try:
+        self.compressed_image_publisher = CompressedImagePublisher(
+            node, self.get_topic_prefix() + "/image/compressed", image_format,
+            quality=node.parameters.get('camera_compressed_quality', 90),
+            max_in_flight=node.parameters.get('camera_compression_max_in_flight', 2))
+      except (ImportError, ValueError) as e:
+        logging.warn("Compressed image of {} disabled: {}".format(self.get_prefix(), e))
+
   def destroy(self):
     super(Camera, self).destroy()
+    self._buffer_pool.clear()
     # todo(zero): destroy writer
 
   def _build_camera_info(self):
@@ -54,32 +87,80 @@ class Camera(Sensor):
     # todo(zero): add camerainfo
 
   def sensor_data_updated(self, carla_camera_data):
-    img_msg = self.get_image(carla_camera_data)
+    image_data_array, encoding = self.get_carla_image_data_array(
+        carla_camera_data)
+    img_msg = self._create_image_msg(image_data_array, encoding,
+                                     carla_camera_data.timestamp)
     cam_info = self._camera_info
     cam_info.header = img_msg.header
     self.camera_info_publisher.write(cam_info)
     self.camera_image_publisher.write(img_msg)
 
+    if self.compressed_image_publisher is not None and encoding in ('bgra8', 'bgr8'):
+      # the carla buffer is only valid during the callback, hand over a copy
+      self.compressed_image_publisher.publish(
+          img_msg.header, np.array(image_data_array[:, :, :3]))
+
   def get_transform(self, pose, timestamp):
     tf_msg = super(Camera, self).get_transform(pose, timestamp)
+    if tf_msg is None:
+      return
     rotation = tf_msg.transform.rotation
-    quat = [rotation.w, rotation.x, rotation.y, rotation.z]
-    quat_swap = transforms3d.quaternions.mat2quat(
-        np.matrix([[0, 0, 1],
-                      [-1, 0, 0],
-                      [0, -1, 0]]))
-    quat = transforms3d.quaternions.qmult(quat, quat_swap)
-    tf_msg.transform.rotation.w = quat[0]
-    tf_msg.transform.rotation.x = quat[1]
-    tf_msg.transform.rotation.y = quat[2]
-    tf_msg.transform.rotation.z = quat[3]
+    quat = [rotation.qw, rotation.qx, rotation.qy, rotation.qz]
+    quat = transforms3d.quaternions.qmult(quat, Camera.QUAT_SWAP)
+    tf_msg.transform.rotation.qw = quat[0]
+    tf_msg.transform.rotation.qx = quat[1]
+    tf_msg.transform.rotation.qy = quat[2]
+    tf_msg.transform.rotation.qz = quat[3]
     return tf_msg
 
   def get_image(self, carla_camera_data):
     image_data_array, encoding = self.get_carla_image_data_array(
         carla_camera_data)
+    return self._create_image_msg(image_data_array, encoding,
+                                  carla_camera_data.timestamp)
+
+  def _create_image_msg(self, image_data_array, encoding, timestamp):
+    if encoding == 'bgra8' and self.image_encoding in Camera.NATIVE_ENCODINGS:
+      return self._create_native_image_msg(image_data_array, timestamp)
     img_msg = Camera.cv_bridge.cv2_to_imgmsg(image_data_array, encoding=encoding)
-    img_msg.header = self.get_msg_header(timestamp=carla_camera_data.timestamp)
+    img_msg.header = self.get_msg_header(timestamp=timestamp)
+    return img_msg
+
+  def _create_native_image_msg(self, bgra_image, timestamp):
+    height, width = bgra_image.shape[:2]
+    img_msg = Image()
+    img_msg.header.CopyFrom(self.get_msg_header(timestamp=timestamp))
+    img_msg.frame_id = img_msg.header.frame_id
+    img_msg.measurement_time = timestamp
+    img_msg.height = height
+    img_msg.width = width
+    img_msg.encoding = self.image_encoding
+
+    pool = self._buffer_pool
+    if self.image_encoding == 'mono8':
+      img_msg.step = width
+      with pool.buffer((height, width), np.uint16) as luma, \
+          pool.buffer((height, width), np.uint16) as channel, \
+          pool.buffer((height, width), np.uint8) as mono:
+        luma.fill(0)
+        for index, weight in enumerate(Camera.MONO_WEIGHTS):
+          np.multiply(bgra_image[:, :, index], weight, out=channel, dtype=np.uint16)
+          luma += channel
+        np.right_shift(luma, 8, out=luma)
+        np.copyto(mono, luma, casting='unsafe')
+        img_msg.data = mono.tobytes()
+    elif self.image_encoding == 'bgra8':
+      img_msg.step = width * 4
+      img_msg.data = bgra_image.tobytes()
+    else:
+      img_msg.step = width * 3
+      # strided view on the carla buffer, tobytes copies it once into the payload
+      if self.image_encoding == 'rgb8':
+        channels = bgra_image[:, :, 2::-1]
+      else:
+        channels = bgra_image[:, :, :3]
+      img_msg.data = channels.tobytes()
     return img_msg
 
   @abstractmethod
@@ -105,6 +186,11 @@ class RgbCamera(Camera):
 
 
 class DepthCamera(Camera):
+  # normalized depth (R + G * 256 + B * 256 * 256) / (256**3 - 1) in meters
+  DEPTH_SCALE = np.float32(1000.0 / (256**3 - 1))
+  # 16 bit encoding in millimeters, saturates at 65.535m
+  DEPTH_MM_MAX = np.iinfo(np.uint16).max
+
   def __init__(self, uid, name, parent, relative_spawn_pose, node, carla_actor, synchronous_mode):
     super(DepthCamera, self).__init__(uid=uid,
                                       name=name,
@@ -113,15 +199,46 @@ class DepthCamera(Camera):
                                       node=node,
                                       carla_actor=carla_actor,
                                       synchronous_mode=synchronous_mode)
+    self.encode_16bit = node.parameters.get('depth_camera_16bit', False)
+    self._packed = None
+    self._scratch = None
+    self._depth = None
+    self._depth_mm = None
 
-  def get_carla_image_data_array(self, carla_image):
-    bgra_image = np.ndarray(
-            shape=(carla_image.height, carla_image.width, 4),
-            dtype=np.uint8, buffer=carla_image.raw_data)
+  def _allocate_buffers(self, height, width):
+    if self._depth is None or self._depth.shape != (height, width):
+      self._packed = np.empty((height, width), dtype=np.uint32)
+      self._scratch = np.empty((height, width), dtype=np.uint32)
+      self._depth = np.empty((height, width), dtype=np.float32)
+      if self.encode_16bit:
+        self._depth_mm = np.empty((height, width), dtype=np.uint16)
 
-    scales = np.array([65536.0, 256.0, 1.0, 0]) / (256**3 - 1) * 1000
-    depth_image = np.dot(bgra_image, scales).astype(np.float32)
+  def decode_depth(self, carla_image):
+    self._allocate_buffers(carla_image.height, carla_image.width)
+    # little endian BGRA pixels read as uint32 are A << 24 | R << 16 | G << 8 | B
+    bgra = np.ndarray(shape=(carla_image.height, carla_image.width),
+                      dtype='<u4', buffer=carla_image.raw_data)
+    packed, scratch = self._packed, self._scratch
+    np.bitwise_and(bgra, 0xff, out=packed)
+    np.left_shift(packed, 16, out=packed)
+    np.bitwise_and(bgra, 0xff00, out=scratch)
+    np.bitwise_or(packed, scratch, out=packed)
+    np.right_shift(bgra, 16, out=scratch)
+    np.bitwise_and(scratch, 0xff, out=scratch)
+    np.bitwise_or(packed, scratch, out=packed)
 
+    np.copyto(self._depth, packed, casting='unsafe')
+    np.multiply(self._depth, DepthCamera.DEPTH_SCALE, out=self._depth)
+    return self._depth
+
+  def get_carla_image_data_array(self, carla_image):
+    depth_image = self.decode_depth(carla_image)
+    if self.encode_16bit:
+      np.multiply(depth_image, np.float32(1000.0), out=self._depth)
+      np.minimum(self._depth, DepthCamera.DEPTH_MM_MAX, out=self._depth)
+      np.rint(self._depth, out=self._depth)
+      np.copyto(self._depth_mm, self._depth, casting='unsafe')
+      return self._depth_mm, '16UC1'
     return depth_image, 'passthrough'
 
 
@@ -153,12 +270,20 @@ class DVSCamera(Camera):
                                     synchronous_mode=synchronous_mode,
                                     is_event_sensor=True)
     self._dvs_events = None
+    # 0 renders only the events of the current callback, values in (0, 1)
+    # accumulate events and fade older ones out by this factor per callback
+    self._event_frame_decay = node.parameters.get('dvs_event_frame_decay', 0.)
+    self._event_frame = None
+    self._event_frame_acc = None
     self.dvs_camera_publisher = node.create_writer(
       self.get_topic_prefix() + '/events', PointCloud2, 10)
 
   def destroy(self):
+    # stops the callbacks before the event frames are dropped
+    super(DVSCamera, self).destroy()
     # todo(zero): delete dvs_camera_publisher
-    pass
+    self._event_frame = None
+    self._event_frame_acc = None
 
   def sensor_data_updated(self, carla_dvs_event_array):
     super(DVSCamera, self).sensor_data_updated(carla_dvs_event_array)
@@ -169,22 +294,34 @@ class DVSCamera(Camera):
         PointField(name='t', offset=4, datatype=PointField.FLOAT64, count=1),
         PointField(name='pol', offset=12, datatype=PointField.INT8, count=1)]
 
-    dvs_events_msg = create_cloud(header, fields, self._dvs_events.tolist())
+    # carla stores t as int64, convert all events to the field layout at once
+    dvs_events = np.empty(len(self._dvs_events), dtype=pc.fields_to_dtype(fields))
+    dvs_events[...] = self._dvs_events
+    dvs_events_msg = create_cloud(header, fields, dvs_events)
     self.dvs_camera_publisher.write(dvs_events_msg)
 
+  def _get_event_frame(self, height, width):
+    if self._event_frame is None or self._event_frame.shape[:2] != (height, width):
+      self._event_frame = np.zeros((height, width, 3), dtype=np.uint8)
+      if self._event_frame_decay > 0:
+        self._event_frame_acc = np.zeros((height, width, 3), dtype=np.float32)
+    return self._event_frame
+
   def get_carla_image_data_array(self, carla_dvs_event_array):
     self._dvs_events = np.frombuffer(carla_dvs_event_array.raw_data,
-                                        dtype=np.dtype([
-                                            ('x', np.uint16),
-                                            ('y', np.uint16),
-                                            ('t', np.int64),
-                                            ('pol', np.bool)
-                                        ]))
-    carla_image_data_array = np.zeros(
-            (carla_dvs_event_array.height, carla_dvs_event_array.width, 3),
-            dtype=np.uint8)
+                                     dtype=pc.DVS_EVENT_DTYPE)
+    carla_image_data_array = self._get_event_frame(
+        carla_dvs_event_array.height, carla_dvs_event_array.width)
     # Blue is positive, red is negative
-    carla_image_data_array[self._dvs_events[:]['y'], self._dvs_events[:]['x'],
-                               self._dvs_events[:]['pol'] * 2] = 255
+    channels = self._dvs_events['pol'].astype(np.intp) * 2
+    if self._event_frame_decay > 0:
+      self._event_frame_acc *= self._event_frame_decay
+      self._event_frame_acc[self._dvs_events['y'], self._dvs_events['x'],
+                            channels] = 255
+      np.copyto(carla_image_data_array, self._event_frame_acc, casting='unsafe')
+    else:
+      carla_image_data_array.fill(0)
+      carla_image_data_array[self._dvs_events['y'], self._dvs_events['x'],
+                             channels] = 255
 
     return carla_image_data_array, 'bgr8'
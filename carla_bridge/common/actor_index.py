@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+# Copyright 2022 daohu527 <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from threading import Lock
+
+
+class ActorIndex(object):
+  """Parent to children index of the actor tree."""
+  def __init__(self):
+    self._parents = {}
+    self._children = {}
+    self._lock = Lock()
+
+  def __contains__(self, uid):
+    return uid in self._parents
+
+  def __len__(self):
+    return len(self._parents)
+
+  def add(self, uid, parent_uid=None):
+    with self._lock:
+      self._parents[uid] = parent_uid
+      if parent_uid is not None:
+        self._children.setdefault(parent_uid, set()).add(uid)
+
+  def remove(self, uid):
+    with self._lock:
+      parent_uid = self._parents.pop(uid, None)
+      if parent_uid is not None:
+        siblings = self._children.get(parent_uid)
+        if siblings is not None:
+          siblings.discard(uid)
+          if not siblings:
+            del self._children[parent_uid]
+
+  def children(self, uid):
+    with self._lock:
+      return list(self._children.get(uid, ()))
+
+  def subtree(self, uid):
+    """uid followed by all its descendants, parents before children."""
+    with self._lock:
+      result = [uid]
+      index = 0
+      while index < len(result):
+        result.extend(self._children.get(result[index], ()))
+        index += 1
+      return result
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+# Copyright 2022 daohu527 <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+class ActorStateCache(object):
+  """State of all actors at the current frame.
+
+  Transform, velocity and acceleration are read from the actor snapshots
+  of the world snapshot, so they cost no RPC. Values the snapshot does not
+  contain, like the control, are requested at most once per frame.
+  Actors missing in the snapshot fall back to the carla actor.
+
+  The tables are replaced as a whole by update, readers need no lock.
+  """
+  def __init__(self):
+    self.frame = None
+    self._snapshots = {}
+    self._controls = {}
+    self._attributes = {}
+
+  def update(self, world_snapshot):
+    self._snapshots = dict(
+        (actor_snapshot.id, actor_snapshot) for actor_snapshot in world_snapshot)
+    self._controls = {}
+    self._attributes = {}
+    self.frame = world_snapshot.frame
+
+  def clear(self):
+    self.frame = None
+    self._snapshots = {}
+    self._controls = {}
+    self._attributes = {}
+
+  def get_transform(self, carla_actor):
+    actor_snapshot = self._snapshots.get(carla_actor.id)
+    if actor_snapshot is None:
+      return carla_actor.get_transform()
+    return actor_snapshot.get_transform()
+
+  def get_velocity(self, carla_actor):
+    actor_snapshot = self._snapshots.get(carla_actor.id)
+    if actor_snapshot is None:
+      return carla_actor.get_velocity()
+    return actor_snapshot.get_velocity()
+
+  def get_angular_velocity(self, carla_actor):
+    actor_snapshot = self._snapshots.get(carla_actor.id)
+    if actor_snapshot is None:
+      return carla_actor.get_angular_velocity()
+    return actor_snapshot.get_angular_velocity()
+
+  def get_acceleration(self, carla_actor):
+    actor_snapshot = self._snapshots.get(carla_actor.id)
+    if actor_snapshot is None:
+      return carla_actor.get_acceleration()
+    return actor_snapshot.get_acceleration()
+
+  def get_control(self, carla_actor):
+    controls = self._controls
+    control = controls.get(carla_actor.id)
+    if control is None:
+      control = carla_actor.get_control()
+      controls[carla_actor.id] = control
+    return control
+
+  def get_attributes(self, carla_actor):
+    attributes = self._attributes
+    actor_attributes = attributes.get(carla_actor.id)
+    if actor_attributes is None:
+      actor_attributes = carla_actor.attributes
+      attributes[carla_actor.id] = actor_attributes
+    return actor_attributes
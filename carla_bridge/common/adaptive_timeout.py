@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+# Copyright 2022 daohu527 <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+class AdaptiveTimeout(object):
+  """Timeout following the observed latency.
+
+  latency_factor times the exponential moving average of the latency,
+  clamped to [min_timeout, max_timeout], max_timeout before the first
+  observation.
+  """
+  def __init__(self, min_timeout, max_timeout, latency_factor=3.0, smoothing=0.2):
+    self.min_timeout = min_timeout
+    self.max_timeout = max_timeout
+    self.latency_factor = latency_factor
+    self.smoothing = smoothing
+    self.latency = None
+
+  def get(self):
+    if self.latency is None:
+      return self.max_timeout
+    return min(self.max_timeout,
+               max(self.min_timeout, self.latency * self.latency_factor))
+
+  def observe(self, latency):
+    if self.latency is None:
+      self.latency = latency
+    else:
+      self.latency += self.smoothing * (latency - self.latency)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+# Copyright 2022 daohu527 <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import defaultdict
+from contextlib import contextmanager
+from threading import Lock
+
+import numpy as np
+
+
+class BufferPool(object):
+  """Recycle numpy buffers of the same shape and dtype."""
+  def __init__(self, max_free=2):
+    self.max_free = max_free
+    self._free = defaultdict(list)
+    self._lock = Lock()
+
+  def acquire(self, shape, dtype):
+    key = (tuple(shape), np.dtype(dtype))
+    with self._lock:
+      if self._free[key]:
+        return self._free[key].pop()
+    return np.empty(shape, dtype=dtype)
+
+  def release(self, buf):
+    key = (buf.shape, buf.dtype)
+    with self._lock:
+      if len(self._free[key]) < self.max_free:
+        self._free[key].append(buf)
+
+  @contextmanager
+  def buffer(self, shape, dtype):
+    buf = self.acquire(shape, dtype)
+    try:
+      yield buf
+    finally:
+      self.release(buf)
+
+  def clear(self):
+    with self._lock:
+      self._free.clear()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+# Copyright 2022 daohu527 <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+import time
+
+from threading import Condition
+
+from carla_bridge.common.adaptive_timeout import AdaptiveTimeout
+
+
+class ControlBarrier(object):
+  """Wait for the control commands of several egos answering one frame.
+
+  Each command names the frame it answers, commands of older frames are
+  rejected. Every ego has its own deadline, adapting to its latency.
+  The latency from publishing the frame to the arrival of the command is
+  counted per ego in a histogram with the upper bounds of BUCKETS.
+  """
+  BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+
+  def __init__(self, min_timeout=0.05, max_timeout=1.0):
+    self.min_timeout = min_timeout
+    self.max_timeout = max_timeout
+    self.frame = None
+    self.missing = []
+    self.rejected = 0
+    self._start = None
+    self._pending = set()
+    self._timeouts = {}
+    self._histograms = {}
+    self._cond = Condition()
+
+  def begin(self, frame, uids):
+    """Expect the commands of uids for frame, before frame is published."""
+    with self._cond:
+      self.frame = frame
+      self._pending = set(uids)
+      self._start = None
+      self.missing = []
+
+  def start(self):
+    """Frame is published, the latencies and deadlines count from now."""
+    with self._cond:
+      self._start = time.monotonic()
+
+  def accept(self, frame=None):
+    """Returns False for a command answering an older frame.
+
+    A command without frame answers the current one.
+    """
+    with self._cond:
+      if frame is not None and self.frame is not None and frame < self.frame:
+        self.rejected += 1
+        return False
+      return True
+
+  def arrive(self, uid, frame=None):
+    """Called once the accepted command of uid was posted."""
+    with self._cond:
+      if frame is not None and frame != self.frame:
+        return
+      if uid in self._pending:
+        self._pending.discard(uid)
+        # commands answering data published before start() count as 0
+        latency = 0. if self._start is None else time.monotonic() - self._start
+        counts = self._histograms.setdefault(uid, [0] * (len(ControlBarrier.BUCKETS) + 1))
+        counts[bisect.bisect_left(ControlBarrier.BUCKETS, latency)] += 1
+        self._observe(uid, latency)
+        self._cond.notify()
+
+  def get_timeout(self, uid):
+    timeout = self._timeouts.get(uid)
+    if timeout is None:
+      return self.max_timeout
+    return timeout.get()
+
+  def wait(self):
+    """Block until all commands arrived or the deadlines of the rest passed.
+
+    Returns the uids without command, which are also left in self.missing.
+    """
+    with self._cond:
+      if self._start is None:
+        self._start = time.monotonic()
+      while self._pending:
+        remaining = max(self._start + self.get_timeout(uid) - time.monotonic()
+                        for uid in self._pending)
+        if remaining <= 0:
+          break
+        self._cond.wait(remaining)
+
+      self.missing = sorted(self._pending)
+      # widen the deadline of the egos which missed it
+      for uid in self.missing:
+        self._observe(uid, time.monotonic() - self._start)
+      self._pending = set()
+      return self.missing
+
+  def get_histograms(self):
+    """Map uid to the counts per bucket, the last one counts the overflow."""
+    with self._cond:
+      return dict((uid, list(counts)) for uid, counts in self._histograms.items())
+
+  def _observe(self, uid, latency):
+    timeout = self._timeouts.get(uid)
+    if timeout is None:
+      timeout = AdaptiveTimeout(self.min_timeout, self.max_timeout)
+      self._timeouts[uid] = timeout
+    timeout.observe(latency)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+# Copyright 2022 daohu527 <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+from threading import Condition
+
+from carla_bridge.common.adaptive_timeout import AdaptiveTimeout
+
+
+class FrameBarrier(object):
+  """Wait for the data of several sensors of one frame at once.
+
+  All sensors share one deadline. The timeout adapts to the latency of
+  the slowest sensor, measured from the return of the tick.
+  """
+  def __init__(self, min_timeout=0.2, max_timeout=1.0):
+    self.timeout = AdaptiveTimeout(min_timeout, max_timeout)
+    self.missing = []
+    self._arrived = []
+    self._cond = Condition()
+
+  def notify(self, uid):
+    """Called from the sensor callback when data of uid arrived."""
+    with self._cond:
+      self._arrived.append(uid)
+      self._cond.notify()
+
+  def get_timeout(self):
+    return self.timeout.get()
+
+  def wait(self, frame, sensors, start=None):
+    """Yield sensors in arrival order once their data of frame is ready.
+
+    sensors maps uid to a sensor with a FrameBuffer, start is the
+    time.monotonic() the tick of frame returned, the deadline and the
+    latencies count from there. Sensors without data at the deadline are
+    left in self.missing.
+    """
+    pending = dict(sensors)
+    if not pending:
+      # nothing was waited for, the latency would only pull the timeout down
+      self.missing = []
+      return
+    if start is None:
+      start = time.monotonic()
+    deadline = start + self.get_timeout()
+    frame_latency = 0.
+
+    with self._cond:
+      self._arrived = []
+    candidates = list(pending)
+    while pending:
+      for uid in candidates:
+        sensor = pending.get(uid)
+        if sensor is not None and sensor.buffer.is_ready(frame):
+          del pending[uid]
+          frame_latency = time.monotonic() - start
+          yield sensor
+      if not pending:
+        break
+      with self._cond:
+        while not self._arrived:
+          remaining = deadline - time.monotonic()
+          if remaining <= 0:
+            break
+          self._cond.wait(remaining)
+        candidates, self._arrived = self._arrived, []
+      if not candidates:
+        break
+
+    self.missing = list(pending.values())
+    if self.missing:
+      # widen the timeout again after a miss
+      frame_latency = time.monotonic() - start
+    self.timeout.observe(frame_latency)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+# Copyright 2022 daohu527 <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+from collections import OrderedDict
+from threading import Condition
+
+
+class FrameBuffer(object):
+  """Bounded buffer of sensor data indexed by frame number.
+
+  Holds at most capacity frames, each frame keeps all data received for
+  it in arrival order. When the buffer is full the policy decides what is
+  lost: DROP_OLDEST evicts the oldest frame, DROP_NEWEST discards the
+  incoming data and BLOCK waits up to block_timeout for space before
+  discarding the incoming data.
+  """
+  DROP_OLDEST = 'drop_oldest'
+  DROP_NEWEST = 'drop_newest'
+  BLOCK = 'block'
+  POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+  def __init__(self, capacity=8, policy=DROP_OLDEST, block_timeout=1.0, listener=None):
+    if capacity < 1:
+      raise ValueError("Frame buffer capacity must be positive, got {}".format(capacity))
+    if policy not in FrameBuffer.POLICIES:
+      raise ValueError("Unknown frame buffer policy '{}'".format(policy))
+    self.capacity = capacity
+    self.policy = policy
+    self.block_timeout = block_timeout
+    # called without arguments after new data was stored
+    self.listener = listener
+    # number of times data arrived while the buffer was full
+    self.overflows = 0
+    # number of data entries lost, by overflow or because they were stale
+    self.dropped = 0
+    self._frames = OrderedDict()
+    self._cond = Condition()
+
+  def __len__(self):
+    with self._cond:
+      return len(self._frames)
+
+  def empty(self):
+    return len(self) == 0
+
+  def put(self, frame, data):
+    with self._cond:
+      if frame not in self._frames and len(self._frames) >= self.capacity:
+        self.overflows += 1
+        if self.policy == FrameBuffer.DROP_OLDEST:
+          _, evicted = self._frames.popitem(last=False)
+          self.dropped += len(evicted)
+        elif self.policy == FrameBuffer.DROP_NEWEST or \
+            not self._cond.wait_for(lambda: len(self._frames) < self.capacity,
+                                    self.block_timeout):
+          self.dropped += 1
+          return False
+      self._frames.setdefault(frame, []).append(data)
+      self._cond.notify_all()
+    if self.listener is not None:
+      self.listener()
+    return True
+
+  def is_ready(self, frame):
+    """True if data of frame, or of a newer frame, is buffered."""
+    with self._cond:
+      return bool(self._frames) and next(reversed(self._frames)) >= frame
+
+  def get(self, frame, timeout=None):
+    """Wait for the first data of frame.
+
+    Frames older than frame are discarded. Returns None on timeout or if
+    data of a newer frame arrived first, the frame will then never come.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with self._cond:
+      while True:
+        self._discard_before(frame)
+        if frame in self._frames:
+          data = self._frames.pop(frame)
+          self.dropped += len(data) - 1
+          self._cond.notify_all()
+          return data[0]
+        if self._frames:
+          return None
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+          return None
+        self._cond.wait(remaining)
+
+  def pop_all(self):
+    """Remove and return all buffered data in frame order."""
+    with self._cond:
+      items = [data for frame_data in self._frames.values() for data in frame_data]
+      self._frames.clear()
+      self._cond.notify_all()
+      return items
+
+  def _discard_before(self, frame):
+    discarded = False
+    while self._frames:
+      oldest = next(iter(self._frames))
+      if oldest >= frame:
+        break
+      self.dropped += len(self._frames.pop(oldest))
+      discarded = True
+    if discarded:
+      self._cond.notify_all()
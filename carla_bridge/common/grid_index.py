@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+# Copyright 2022 daohu527 <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+
+class GridIndex(object):
+  """Radius queries on an array of 2d points.
+
+  The points are sorted by the grid cell they fall into, a query only
+  looks at the cells overlapping the circle.
+  """
+  def __init__(self, points, cell_size):
+    self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    self.cell_size = float(cell_size)
+    cells = np.floor(self.points / self.cell_size).astype(np.int64)
+    self._keys = self._key(cells[:, 0], cells[:, 1])
+    self._order = np.argsort(self._keys, kind="stable")
+    self._keys = self._keys[self._order]
+
+  @staticmethod
+  def _key(cell_x, cell_y):
+    # ordered by column, then by row
+    return cell_x * (1 << 32) + (cell_y + (1 << 31))
+
+  def query_radius(self, x, y, radius):
+    """Indices of the points within radius of (x, y)."""
+    if not len(self.points):
+      return np.empty(0, dtype=np.intp)
+    min_x, max_x = (int(np.floor((x - radius) / self.cell_size)),
+                    int(np.floor((x + radius) / self.cell_size)))
+    min_y, max_y = (int(np.floor((y - radius) / self.cell_size)),
+                    int(np.floor((y + radius) / self.cell_size)))
+    # cells of one column are consecutive in key order
+    candidates = []
+    for cell_x in range(min_x, max_x + 1):
+      begin = np.searchsorted(self._keys, self._key(cell_x, min_y), side="left")
+      end = np.searchsorted(self._keys, self._key(cell_x, max_y), side="right")
+      if begin < end:
+        candidates.append(self._order[begin:end])
+    if not candidates:
+      return np.empty(0, dtype=np.intp)
+    candidates = np.concatenate(candidates)
+    offsets = self.points[candidates] - (x, y)
+    return candidates[np.einsum("ij,ij->i", offsets, offsets) <= radius * radius]
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+# Copyright 2022 daohu527 <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Local JSON files caching data queried from carla
+"""
+
+import json
+import logging
+import os
+
+
+def get_cache_file(cache_dir, name, version):
+  """Path of the cache of name for a carla version, None if not cached."""
+  if not version or not cache_dir:
+    return None
+  return os.path.join(cache_dir, "{}_{}.json".format(name, version))
+
+
+def load(cache_file):
+  """Content of cache_file, None if it is missing or can not be read."""
+  if not os.path.exists(cache_file):
+    return None
+  try:
+    with open(cache_file) as f:
+      return json.load(f)
+  except (IOError, ValueError) as e:
+    logging.warn("Load cache {} failed: {}".format(cache_file, e))
+    return None
+
+
+def save(cache_file, data):
+  try:
+    if not os.path.isdir(os.path.dirname(cache_file)):
+      os.makedirs(os.path.dirname(cache_file))
+    with open(cache_file, "w") as f:
+      json.dump(data, f)
+  except (IOError, OSError) as e:
+    logging.warn("Save cache {} failed: {}".format(cache_file, e))
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+# Copyright 2022 daohu527 <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+# PointField datatype constants
+INT8 = 1
+UINT8 = 2
+INT16 = 3
+UINT16 = 4
+INT32 = 5
+UINT32 = 6
+FLOAT32 = 7
+FLOAT64 = 8
+
+_DATATYPES = {
+  INT8: np.int8,
+  UINT8: np.uint8,
+  INT16: np.int16,
+  UINT16: np.uint16,
+  INT32: np.int32,
+  UINT32: np.uint32,
+  FLOAT32: np.float32,
+  FLOAT64: np.float64,
+}
+
+LIDAR_DTYPE = np.dtype([
+  ('x', np.float32),
+  ('y', np.float32),
+  ('z', np.float32),
+  ('intensity', np.float32)])
+
+RADAR_DETECTION_DTYPE = np.dtype([
+  ('velocity', np.float32),
+  ('azimuth', np.float32),
+  ('altitude', np.float32),
+  ('depth', np.float32)])
+
+RADAR_DTYPE = np.dtype([
+  ('x', np.float32),
+  ('y', np.float32),
+  ('z', np.float32),
+  ('Range', np.float32),
+  ('Velocity', np.float32),
+  ('AzimuthAngle', np.float32),
+  ('ElevationAngle', np.float32)])
+
+DVS_EVENT_DTYPE = np.dtype([
+  ('x', np.uint16),
+  ('y', np.uint16),
+  ('t', np.int64),
+  ('pol', np.bool_)])
+
+SEMANTIC_LIDAR_DTYPE = np.dtype([
+  ('x', np.float32),
+  ('y', np.float32),
+  ('z', np.float32),
+  ('CosAngle', np.float32),
+  ('ObjIdx', np.uint32),
+  ('ObjTag', np.uint32)])
+
+# CARLA semantic tags grouped for the split semantic lidar topics
+SEMANTIC_TAG_GROUPS = (
+  ('ground', (6, 7, 8, 14, 22)),  # RoadLine, Road, SideWalk, Ground, Terrain
+  ('vehicles', (10,)),
+  ('pedestrians', (4,)),
+)
+
+
+def fields_to_dtype(fields, point_step=None):
+  """Build the structured numpy dtype matching a list of PointField."""
+  names, formats, offsets = [], [], []
+  for field in fields:
+    names.append(field.name)
+    dtype = np.dtype(_DATATYPES[field.datatype])
+    if field.count != 1:
+      dtype = np.dtype((dtype, field.count))
+    formats.append(dtype)
+    offsets.append(field.offset)
+  spec = {'names': names, 'formats': formats, 'offsets': offsets}
+  if point_step is not None:
+    spec['itemsize'] = point_step
+  return np.dtype(spec)
+
+
+def pack_points(raw_data, dtype, flip_y=True):
+  """Copy a sensor raw_data buffer into a writable payload.
+
+  The buffer is copied exactly once, the returned points array is a view
+  on the payload so modifications (e.g. flipping y to the right-handed
+  frame) are written straight into the bytes that will be published.
+  """
+  payload = bytearray(memoryview(raw_data))
+  points = np.frombuffer(payload, dtype=dtype)
+  if flip_y:
+    points['y'] *= -1
+  return payload, points
+
+
+def split_by_tag(points, tag_groups=SEMANTIC_TAG_GROUPS):
+  """Split semantic points into one contiguous array per tag group.
+
+  Points are grouped with a single stable argsort plus bincount, points
+  whose tag is in no group are dropped.
+  """
+  lookup = np.full(256, len(tag_groups), dtype=np.intp)
+  for index, (_, tags) in enumerate(tag_groups):
+    lookup[list(tags)] = index
+
+  groups = lookup[np.minimum(points['ObjTag'], 255)]
+  order = np.argsort(groups, kind='stable')
+  counts = np.bincount(groups, minlength=len(tag_groups) + 1)
+  bounds = np.concatenate(([0], np.cumsum(counts)))
+
+  grouped = points[order]
+  return {name: grouped[bounds[index]:bounds[index + 1]]
+          for index, (name, _) in enumerate(tag_groups)}
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+# Copyright 2022 daohu527 <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Collect control commands and apply them once per tick
+"""
+
+import logging
+
+from threading import Lock
+
+import carla
+
+
+class ControlMailbox(object):
+  """Latest control command of each actor.
+
+  Commands arriving faster than the simulation ticks replace each other,
+  only the latest one per actor is sent. flush() applies the commands of
+  all actors in one batch.
+  """
+  def __init__(self, client=None):
+    self.client = client
+    self._commands = {}
+    self._lock = Lock()
+    self.received = 0
+    self.applied = 0
+    self.coalesced = 0
+    self.dropped = 0
+
+  def post(self, carla_actor, control):
+    with self._lock:
+      if carla_actor.id in self._commands:
+        self.coalesced += 1
+      self._commands[carla_actor.id] = (carla_actor, control)
+      self.received += 1
+
+  def post_many(self, commands):
+    """Post a list of (carla_actor, control) pairs."""
+    with self._lock:
+      for carla_actor, control in commands:
+        if carla_actor.id in self._commands:
+          self.coalesced += 1
+        self._commands[carla_actor.id] = (carla_actor, control)
+      self.received += len(commands)
+
+  def discard(self, actor_id):
+    """Drop the pending command of an actor, e.g. when it is destroyed."""
+    with self._lock:
+      if self._commands.pop(actor_id, None) is not None:
+        self.dropped += 1
+
+  def flush(self):
+    with self._lock:
+      commands, self._commands = self._commands, {}
+    if not commands:
+      return
+
+    if self.client is None:
+      for carla_actor, control in commands.values():
+        carla_actor.apply_control(control)
+    else:
+      self.client.apply_batch([ControlMailbox._create_command(actor_id, control)
+                               for actor_id, (_, control) in commands.items()])
+    with self._lock:
+      self.applied += len(commands)
+
+  def get_stats(self):
+    with self._lock:
+      return {"received": self.received,
+              "applied": self.applied,
+              "coalesced": self.coalesced,
+              "dropped": self.dropped}
+
+  def log_stats(self):
+    logging.info("Control commands received: {received}, applied: {applied}, "
+                 "coalesced: {coalesced}, dropped: {dropped}".format(**self.get_stats()))
+
+  @staticmethod
+  def _create_command(actor_id, control):
+    if isinstance(control, carla.WalkerControl):
+      return carla.command.ApplyWalkerControl(actor_id, control)
+    return carla.command.ApplyVehicleControl(actor_id, control)
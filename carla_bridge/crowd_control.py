@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+# Copyright 2022 daohu527 <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Control all walkers through one topic
+"""
+
+import logging
+
+import numpy as np
+
+from carla import Vector3D, WalkerControl
+
+from carla_msgs.msg import CarlaCrowdControl
+
+from carla_bridge.walker import Walker
+
+
+class CrowdControl(object):
+  """Apply the walker controls of a CarlaCrowdControl message.
+
+  The controls are converted as arrays and posted to the control mailbox
+  of the node, which applies them with the other commands of the tick in
+  one batch. Ids which are not a known walker are dropped.
+  """
+  def __init__(self, actor_factory, node):
+    self._actor_factory = actor_factory
+    self._control_mailbox = node.control_mailbox
+    self.dropped = 0
+    self._crowd_control_subscriber = node.create_reader(
+      "/carla/crowd_control_cmd",
+      CarlaCrowdControl,
+      self.control_command_updated)
+
+  def control_command_updated(self, crowd_control):
+    ids = np.asarray(crowd_control.id, dtype=np.uint32)
+    if not len(ids):
+      return
+    directions = np.column_stack((np.asarray(crowd_control.direction_x, dtype=np.float32),
+                                  np.asarray(crowd_control.direction_y, dtype=np.float32),
+                                  np.asarray(crowd_control.direction_z, dtype=np.float32)))
+    directions[:, 1] *= -1
+    speeds = np.asarray(crowd_control.speed, dtype=np.float32)
+    jumps = np.asarray(crowd_control.jump, dtype=bool)
+    if not len(directions) == len(speeds) == len(jumps) == len(ids):
+      logging.warn("Crowd control message with fields of different lengths ignored")
+      return
+
+    actors = self._actor_factory.actors
+    commands = []
+    for uid, direction, speed, jump in zip(ids.tolist(), directions.tolist(),
+                                           speeds.tolist(), jumps.tolist()):
+      walker = actors.get(uid)
+      if not isinstance(walker, Walker):
+        self.dropped += 1
+        continue
+      commands.append((walker.carla_actor, WalkerControl(
+          direction=Vector3D(*direction), speed=speed, jump=jump)))
+    self._control_mailbox.post_many(commands)
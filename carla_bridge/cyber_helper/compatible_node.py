@@ -23,6 +23,7 @@ class CompatibleNode:
     self.on_tick_id = None
     self._registered_actors = None
     self.spawn_object_service = None
+    self.spawn_objects_service = None
     self.destroy_object_service = None
 
   def get_param(self, key, default_value):
@@ -19,7 +19,8 @@ import math
 
 
 class EgoVehicle(Vehicle):
-  def __init__(self, uid, name, parent, node, carla_actor, vehicle_control_applied_callback):
+  def __init__(self, uid, name, parent, node, carla_actor, vehicle_control_applied_callback,
+               vehicle_control_received_callback):
     super(EgoVehicle, self).__init__(uid=uid,
                                      name=name,
                                      parent=parent,
@@ -28,6 +29,7 @@ class EgoVehicle(Vehicle):
     self.vehicle_info_published = False
     self.vehicle_control_override = False
     self._vehicle_control_applied_callback = vehicle_control_applied_callback
+    self._vehicle_control_received_callback = vehicle_control_received_callback
 
     self.vehicle_status_publisher = node.create_writer(
       self.get_topic_prefix() + "/vehicle_status",
@@ -73,16 +75,20 @@ class EgoVehicle(Vehicle):
   def send_vehicle_msgs(self, frame, timestamp):
     vehicle_status = CarlaEgoVehicleStatus(
             header=self.get_msg_header("map", timestamp=timestamp))
-    vehicle_status.velocity = self.get_vehicle_speed_abs(self.carla_actor)
+    # control commands answering this frame echo the sequence number
+    vehicle_status.header.sequence_num = frame
+    vehicle_status.velocity = math.sqrt(EgoVehicle.get_vector_length_squared(
+        self.state_cache.get_velocity(self.carla_actor)))
     vehicle_status.acceleration.linear = self.get_current_ros_accel().linear
     vehicle_status.orientation = self.get_current_ros_pose().orientation
-    vehicle_status.control.throttle = self.carla_actor.get_control().throttle
-    vehicle_status.control.steer = self.carla_actor.get_control().steer
-    vehicle_status.control.brake = self.carla_actor.get_control().brake
-    vehicle_status.control.hand_brake = self.carla_actor.get_control().hand_brake
-    vehicle_status.control.reverse = self.carla_actor.get_control().reverse
-    vehicle_status.control.gear = self.carla_actor.get_control().gear
-    vehicle_status.control.manual_gear_shift = self.carla_actor.get_control().manual_gear_shift
+    control = self.state_cache.get_control(self.carla_actor)
+    vehicle_status.control.throttle = control.throttle
+    vehicle_status.control.steer = control.steer
+    vehicle_status.control.brake = control.brake
+    vehicle_status.control.hand_brake = control.hand_brake
+    vehicle_status.control.reverse = control.reverse
+    vehicle_status.control.gear = control.gear
+    vehicle_status.control.manual_gear_shift = control.manual_gear_shift
     self.vehicle_status_publisher.write(vehicle_status)
 
     if not self.vehicle_info_published:
@@ -90,45 +96,37 @@ class EgoVehicle(Vehicle):
       vehicle_info = CarlaEgoVehicleInfo()
       vehicle_info.id = self.carla_actor.id
       vehicle_info.type = self.carla_actor.type_id
-      vehicle_info.rolename = self.carla_actor.attributes.get('role_name')
-      vehicle_physics = self.carla_actor.get_physics_control()
+      vehicle_info.rolename = self.state_cache.get_attributes(self.carla_actor).get('role_name')
+      info = self.node.vehicle_info_cache.get(self.carla_actor, self.get_carla_transform())
 
-      for wheel in vehicle_physics.wheels:
+      for wheel in info["wheels"]:
         wheel_info = CarlaEgoVehicleInfoWheel()
-        wheel_info.tire_friction = wheel.tire_friction
-        wheel_info.damping_rate = wheel.damping_rate
-        wheel_info.max_steer_angle = math.radians(wheel.max_steer_angle)
-        wheel_info.radius = wheel.radius
-        wheel_info.max_brake_torque = wheel.max_brake_torque
-        wheel_info.max_handbrake_torque = wheel.max_handbrake_torque
-
-        inv_T = numpy.array(self.carla_actor.get_transform().get_inverse_matrix(), dtype=float)
-        wheel_pos_in_map = numpy.array([wheel.position.x/100.0,
-                                wheel.position.y/100.0,
-                                wheel.position.z/100.0,
-                                1.0])
-        wheel_pos_in_ego_vehicle = numpy.matmul(inv_T, wheel_pos_in_map)
-        wheel_info.position.x = wheel_pos_in_ego_vehicle[0]
-        wheel_info.position.y = -wheel_pos_in_ego_vehicle[1]
-        wheel_info.position.z = wheel_pos_in_ego_vehicle[2]
+        wheel_info.tire_friction = wheel["tire_friction"]
+        wheel_info.damping_rate = wheel["damping_rate"]
+        wheel_info.max_steer_angle = wheel["max_steer_angle"]
+        wheel_info.radius = wheel["radius"]
+        wheel_info.max_brake_torque = wheel["max_brake_torque"]
+        wheel_info.max_handbrake_torque = wheel["max_handbrake_torque"]
+        wheel_info.position.x = wheel["position"][0]
+        wheel_info.position.y = wheel["position"][1]
+        wheel_info.position.z = wheel["position"][2]
         vehicle_info.wheels.append(wheel_info)
 
-      vehicle_info.max_rpm = vehicle_physics.max_rpm
-      vehicle_info.max_rpm = vehicle_physics.max_rpm
-      vehicle_info.moi = vehicle_physics.moi
-      vehicle_info.damping_rate_full_throttle = vehicle_physics.damping_rate_full_throttle
+      vehicle_info.max_rpm = info["max_rpm"]
+      vehicle_info.moi = info["moi"]
+      vehicle_info.damping_rate_full_throttle = info["damping_rate_full_throttle"]
       vehicle_info.damping_rate_zero_throttle_clutch_engaged = \
-          vehicle_physics.damping_rate_zero_throttle_clutch_engaged
+          info["damping_rate_zero_throttle_clutch_engaged"]
       vehicle_info.damping_rate_zero_throttle_clutch_disengaged = \
-          vehicle_physics.damping_rate_zero_throttle_clutch_disengaged
-      vehicle_info.use_gear_autobox = vehicle_physics.use_gear_autobox
-      vehicle_info.gear_switch_time = vehicle_physics.gear_switch_time
-      vehicle_info.clutch_strength = vehicle_physics.clutch_strength
-      vehicle_info.mass = vehicle_physics.mass
-      vehicle_info.drag_coefficient = vehicle_physics.drag_coefficient
-      vehicle_info.center_of_mass.x = vehicle_physics.center_of_mass.x
-      vehicle_info.center_of_mass.y = vehicle_physics.center_of_mass.y
-      vehicle_info.center_of_mass.z = vehicle_physics.center_of_mass.z
+          info["damping_rate_zero_throttle_clutch_disengaged"]
+      vehicle_info.use_gear_autobox = info["use_gear_autobox"]
+      vehicle_info.gear_switch_time = info["gear_switch_time"]
+      vehicle_info.clutch_strength = info["clutch_strength"]
+      vehicle_info.mass = info["mass"]
+      vehicle_info.drag_coefficient = info["drag_coefficient"]
+      vehicle_info.center_of_mass.x = info["center_of_mass"][0]
+      vehicle_info.center_of_mass.y = info["center_of_mass"][1]
+      vehicle_info.center_of_mass.z = info["center_of_mass"][2]
 
       self.vehicle_info_publisher.write(vehicle_info)
 
@@ -137,7 +135,7 @@ class EgoVehicle(Vehicle):
     super(EgoVehicle, self).update(frame, timestamp)
 
   def destroy(self):
-    pass
+    self.node.control_mailbox.discard(self.carla_actor.id)
 
   def control_command_override(self, enable):
     self.vehicle_control_override = enable.data
@@ -152,13 +150,26 @@ class EgoVehicle(Vehicle):
       vehicle_control.reverse = ros_vehicle_control.reverse
       vehicle_control.manual_gear_shift = ros_vehicle_control.manual_gear_shift
       vehicle_control.gear = ros_vehicle_control.gear
-      self.carla_actor.apply_control(vehicle_control)
-      self._vehicle_control_applied_callback(self.get_id())
+      frame = EgoVehicle.get_command_frame(ros_vehicle_control)
+      if not self._vehicle_control_received_callback(self.get_id(), frame):
+        return
+      # applied together with the commands of all egos before the next tick,
+      # posted before signalling it so the tick can not miss it
+      self.node.control_mailbox.post(self.carla_actor, vehicle_control)
+      self._vehicle_control_applied_callback(self.get_id(), frame)
 
   def enable_autopilot_updated(self, enable_auto_pilot):
     logging.debug("Ego vehicle: Set autopilot to {}".format(enable_auto_pilot.data))
     self.carla_actor.set_autopilot(enable_auto_pilot.data)
 
+  @staticmethod
+  def get_command_frame(ros_vehicle_control):
+    """Frame a command answers, the sequence number of the vehicle status."""
+    if ros_vehicle_control.HasField("header") and \
+        ros_vehicle_control.header.HasField("sequence_num"):
+      return ros_vehicle_control.header.sequence_num
+    return None
+
   @staticmethod
   def get_vector_length_squared(carla_vector):
     return carla_vector.x * carla_vector.x + \
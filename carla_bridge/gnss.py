@@ -28,7 +28,7 @@ class Gnss(Sensor):
         self.get_topic_prefix(), NavSatFix, 10)
 
   def destroy(self):
-    pass
+    super(Gnss, self).destroy()
 
   def sensor_data_updated(self, carla_gnss_measurement):
     navsatfix_msg = NavSatFix()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+# Copyright 2022 daohu527 <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Encode camera images to jpeg/png outside of the tick thread
+"""
+
+import logging
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from threading import BoundedSemaphore, Lock
+
+try:
+  import cv2
+except ImportError:
+  cv2 = None
+
+from modules.drivers.proto.sensor_image_pb2 import CompressedImage
+
+
+def encode_image(image, image_format, quality):
+  if image_format == 'jpeg':
+    success, data = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+  else:
+    success, data = cv2.imencode('.png', image)
+  if not success:
+    raise RuntimeError("Encode image to {} failed".format(image_format))
+  return data.tobytes()
+
+
+class CompressedImagePublisher(object):
+  """Publish compressed images of one topic.
+
+  Images are encoded by a pool shared between all topics. At most
+  max_in_flight images per topic are encoded at the same time, newer
+  images are dropped while all slots are busy. Finished images are
+  published in submission order, so timestamps never go backwards.
+  """
+  FORMATS = ('jpeg', 'png')
+
+  _executor = None
+  _executor_lock = Lock()
+
+  def __init__(self, node, topic, image_format, quality=90, max_in_flight=2):
+    if cv2 is None:
+      raise ImportError("Compressed images require the cv2 module")
+    if image_format not in CompressedImagePublisher.FORMATS:
+      raise ValueError("Unsupported image format '{}'".format(image_format))
+
+    self.image_format = image_format
+    self.quality = quality
+    self.dropped = 0
+    self._executor = CompressedImagePublisher.get_executor(node.parameters)
+    self._slots = BoundedSemaphore(max_in_flight)
+    self._pending = deque()
+    self._lock = Lock()
+    self._writer = node.create_writer(topic, CompressedImage, 10)
+
+  @classmethod
+  def get_executor(cls, parameters):
+    with cls._executor_lock:
+      if cls._executor is None:
+        workers = parameters.get('camera_compression_workers', 2)
+        if parameters.get('camera_compression_use_processes', False):
+          cls._executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+          cls._executor = ThreadPoolExecutor(max_workers=workers)
+      return cls._executor
+
+  @classmethod
+  def shutdown(cls):
+    with cls._executor_lock:
+      if cls._executor is not None:
+        cls._executor.shutdown(wait=True)
+        cls._executor = None
+
+  def publish(self, header, image):
+    """Queue image for encoding, the image must not be modified afterwards.
+
+    Returns False if the image was dropped.
+    """
+    if not self._slots.acquire(False):
+      self.dropped += 1
+      return False
+    future = self._executor.submit(encode_image, image, self.image_format, self.quality)
+    with self._lock:
+      self._pending.append((header, future))
+    future.add_done_callback(self._on_encoded)
+    return True
+
+  def _on_encoded(self, _):
+    with self._lock:
+      while self._pending and self._pending[0][1].done():
+        header, future = self._pending.popleft()
+        self._slots.release()
+        try:
+          data = future.result()
+        except Exception as e:
+          logging.warn("Compress image {} failed: {}".format(header.frame_id, e))
+          continue
+        compressed_image = CompressedImage()
+        compressed_image.header.CopyFrom(header)
+        compressed_image.frame_id = header.frame_id
+        compressed_image.measurement_time = header.timestamp_sec
+        compressed_image.format = self.image_format
+        compressed_image.data = data
+        self._writer.write(compressed_image)
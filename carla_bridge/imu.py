@@ -26,7 +26,7 @@ class ImuSensor(Sensor):
     self.imu_publisher = node.create_writer(self.get_topic_prefix(), Imu, 10)
 
   def destroy(self):
-    pass
+    super(ImuSensor, self).destroy()
 
   def sensor_data_updated(self, carla_imu_measurement):
     imu_msg = Imu()
@@ -16,6 +16,8 @@
 
 import numpy
 
+import carla_bridge.common.point_cloud as pc
+
 class Lidar(Sensor):
   def __init__(self, uid, name, parent, relative_spawn_pose, node, carla_actor, synchronous_mode):
     super(Lidar, self).__init__(uid=uid,
@@ -30,7 +32,7 @@ class Lidar(Sensor):
                                               PointCloud2, 10)
 
   def destroy(self):
-    pass
+    super(Lidar, self).destroy()
 
   def sensor_data_updated(self, carla_lidar_measurement):
     header = self.get_msg_header(timestamp=carla_lidar_measurement.timestamp)
@@ -40,12 +42,8 @@ class Lidar(Sensor):
             PointField(name='z', offset=8, datatype=PointField.FLOAT32, count=1),
             PointField(name='intensity', offset=12, datatype=PointField.FLOAT32, count=1)]
 
-    lidar_data = numpy.fromstring(
-            bytes(carla_lidar_measurement.raw_data), dtype=numpy.float32)
-    lidar_data = numpy.reshape(
-            lidar_data, (int(lidar_data.shape[0] / 4), 4))
-    lidar_data[:, 1] *= -1
-    point_cloud_msg = create_cloud(header, fields, lidar_data)
+    payload, _ = pc.pack_points(carla_lidar_measurement.raw_data, pc.LIDAR_DTYPE)
+    point_cloud_msg = create_cloud(header, fields, payload)
     self.lidar_publisher.write(point_cloud_msg)
 
 
@@ -61,8 +59,15 @@ class SemanticLidar(Sensor):
     self.semantic_lidar_publisher = node.create_writer(self.get_topic_prefix(),
                                                        PointCloud2, 10)
 
+    self.split_tags = node.parameters.get('semantic_lidar_split_tags', False)
+    self.tag_publishers = {}
+    if self.split_tags:
+      for name, _ in pc.SEMANTIC_TAG_GROUPS:
+        self.tag_publishers[name] = node.create_writer(
+          self.get_topic_prefix() + "/" + name, PointCloud2, 10)
+
   def destroy(self):
-    pass
+    super(SemanticLidar, self).destroy()
 
   def sensor_data_updated(self, carla_lidar_measurement):
     header = self.get_msg_header(timestamp=carla_lidar_measurement.timestamp)
@@ -73,15 +78,11 @@ class SemanticLidar(Sensor):
         PointField(name='CosAngle', offset=12, datatype=PointField.FLOAT32, count=1),
         PointField(name='ObjIdx', offset=16, datatype=PointField.UINT32, count=1),
         PointField(name='ObjTag', offset=20, datatype=PointField.UINT32, count=1)]
-    lidar_data = numpy.fromstring(bytes(carla_lidar_measurement.raw_data),
-                                      dtype=numpy.dtype([
-                                          ('x', numpy.float32),
-                                          ('y', numpy.float32),
-                                          ('z', numpy.float32),
-                                          ('CosAngle', numpy.float32),
-                                          ('ObjIdx', numpy.uint32),
-                                          ('ObjTag', numpy.uint32)
-                                      ]))
-    lidar_data['y'] *= -1
-    point_cloud_msg = create_cloud(header, fields, lidar_data.tolist())
+    payload, lidar_data = pc.pack_points(carla_lidar_measurement.raw_data,
+                                         pc.SEMANTIC_LIDAR_DTYPE)
+    point_cloud_msg = create_cloud(header, fields, payload)
     self.semantic_lidar_publisher.write(point_cloud_msg)
+
+    if self.split_tags:
+      for name, points in pc.split_by_tag(lidar_data).items():
+        self.tag_publishers[name].write(create_cloud(header, fields, points))
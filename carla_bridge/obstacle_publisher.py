@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+
+# Copyright 2022 daohu527 <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Publish the ground truth obstacles around the ego vehicles
+"""
+
+import numpy as np
+
+from modules.perception.proto.perception_obstacle_pb2 import PerceptionObstacle, PerceptionObstacles
+
+from carla_bridge.common.grid_index import GridIndex
+from carla_bridge.ego_vehicle import EgoVehicle
+from carla_bridge.traffic_participant import TrafficParticipant
+from carla_bridge.vehicle import Vehicle
+from carla_bridge.walker import Walker
+
+
+class ObstaclePublisher(object):
+  """One PerceptionObstacles message per ego vehicle and frame.
+
+  The states of all traffic participants are read from the world snapshot
+  into arrays and converted together, the bounding boxes are cached per
+  actor. Each ego gets the obstacles within radius, found with a grid
+  index over the obstacle positions.
+  """
+  def __init__(self, actor_factory, node, radius=100.0):
+    self._actor_factory = actor_factory
+    self._node = node
+    self.radius = radius
+    # uid -> (length, width, height, center x, center y, center z, type)
+    self._shapes = {}
+    self._publishers = {}
+
+  def update(self, world_snapshot, timestamp):
+    actors = self._actor_factory.actors
+    egos = [actor for actor in actors.values() if isinstance(actor, EgoVehicle)]
+    self._publishers = dict((ego.uid, self._get_publisher(ego)) for ego in egos)
+    for uid in [uid for uid in self._shapes if uid not in actors]:
+      del self._shapes[uid]
+    if not egos:
+      return
+
+    participants = [actor for actor in actors.values() if isinstance(actor, TrafficParticipant)]
+    uids = np.empty(len(participants), dtype=np.int64)
+    # x, y, z, yaw, velocity and acceleration in carla coordinates
+    states = np.empty((len(participants), 10))
+    shapes = np.empty((len(participants), 7))
+    count = 0
+    for actor in participants:
+      actor_snapshot = world_snapshot.find(actor.uid)
+      if actor_snapshot is None:
+        continue
+      transform = actor_snapshot.get_transform()
+      velocity = actor_snapshot.get_velocity()
+      acceleration = actor_snapshot.get_acceleration()
+      states[count] = (transform.location.x, transform.location.y, transform.location.z,
+                       transform.rotation.yaw, velocity.x, velocity.y, velocity.z,
+                       acceleration.x, acceleration.y, acceleration.z)
+      shapes[count] = self._get_shape(actor)
+      uids[count] = actor.uid
+      count += 1
+    uids, states, shapes = uids[:count], states[:count], shapes[:count]
+
+    # bounding box centers, then conversion to the right handed map frame
+    yaw = np.radians(states[:, 3])
+    cos_yaw, sin_yaw = np.cos(yaw), np.sin(yaw)
+    positions = np.column_stack((
+        states[:, 0] + shapes[:, 3] * cos_yaw - shapes[:, 4] * sin_yaw,
+        -(states[:, 1] + shapes[:, 3] * sin_yaw + shapes[:, 4] * cos_yaw),
+        states[:, 2] + shapes[:, 5]))
+    headings = -yaw
+    states[:, 5] *= -1
+    states[:, 8] *= -1
+
+    grid = GridIndex(positions[:, :2], self.radius)
+    rows = dict((uid, row) for row, uid in enumerate(uids.tolist()))
+    for ego in egos:
+      row = rows.get(ego.uid)
+      if row is None:
+        continue
+      nearby = grid.query_radius(positions[row, 0], positions[row, 1], self.radius)
+      nearby = nearby[nearby != row]
+      self._publishers[ego.uid].write(self._create_msg(
+          ego, timestamp, uids[nearby], positions[nearby], headings[nearby],
+          states[nearby], shapes[nearby]))
+
+  def _get_publisher(self, ego):
+    publisher = self._publishers.get(ego.uid)
+    if publisher is None:
+      publisher = self._node.create_writer(
+          ego.get_topic_prefix() + "/perception_obstacles", PerceptionObstacles, 10)
+    return publisher
+
+  def _get_shape(self, actor):
+    shape = self._shapes.get(actor.uid)
+    if shape is None:
+      bounding_box = actor.carla_actor.bounding_box
+      shape = (bounding_box.extent.x * 2.0, bounding_box.extent.y * 2.0,
+               bounding_box.extent.z * 2.0, bounding_box.location.x,
+               bounding_box.location.y, bounding_box.location.z,
+               ObstaclePublisher._get_type(actor))
+      self._shapes[actor.uid] = shape
+    return shape
+
+  @staticmethod
+  def _get_type(actor):
+    if isinstance(actor, Walker):
+      return PerceptionObstacle.PEDESTRIAN
+    if isinstance(actor, Vehicle):
+      if actor.carla_actor.attributes.get("number_of_wheels") == "2":
+        return PerceptionObstacle.BICYCLE
+      return PerceptionObstacle.VEHICLE
+    return PerceptionObstacle.UNKNOWN_MOVABLE
+
+  @staticmethod
+  def _create_msg(ego, timestamp, uids, positions, headings, states, shapes):
+    obstacles = PerceptionObstacles()
+    obstacles.header.CopyFrom(ego.get_msg_header("map", timestamp=timestamp))
+    for uid, position, heading, state, shape in zip(
+        uids.tolist(), positions.tolist(), headings.tolist(),
+        states.tolist(), shapes.tolist()):
+      obstacle = obstacles.perception_obstacle.add()
+      obstacle.id = uid
+      obstacle.position.x, obstacle.position.y, obstacle.position.z = position
+      obstacle.theta = heading
+      obstacle.velocity.x, obstacle.velocity.y, obstacle.velocity.z = state[4:7]
+      obstacle.acceleration.x, obstacle.acceleration.y, obstacle.acceleration.z = state[7:10]
+      obstacle.length, obstacle.width, obstacle.height = shape[:3]
+      obstacle.type = int(shape[6])
+      obstacle.timestamp = timestamp
+    return obstacles
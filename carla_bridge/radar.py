@@ -16,6 +16,8 @@
 
 import numpy as np
 
+import carla_bridge.common.point_cloud as pc
+
 class Radar(Sensor):
   def __init__(self, uid, name, parent, relative_spawn_pose, node, carla_actor, synchronous_mode):
     super(Radar, self).__init__(uid=uid,
@@ -29,7 +31,7 @@ class Radar(Sensor):
                                               PointCloud2, 10)
 
   def destroy(self):
-    pass
+    super(Radar, self).destroy()
 
   def sensor_data_updated(self, carla_radar_measurement):
     fields = [
@@ -39,15 +41,25 @@ class Radar(Sensor):
             PointField(name='Range', offset=12, datatype=PointField.FLOAT32, count=1),
             PointField(name='Velocity', offset=16, datatype=PointField.FLOAT32, count=1),
             PointField(name='AzimuthAngle', offset=20, datatype=PointField.FLOAT32, count=1),
-            PointField(name='ElevationAngle', offset=28, datatype=PointField.FLOAT32, count=1)]
-
-    points = []
-    for detection in carla_radar_measurement:
-      points.append([detection.depth * np.cos(detection.azimuth) * np.cos(-detection.altitude),
-                     detection.depth * np.sin(-detection.azimuth) *
-                     np.cos(detection.altitude),
-                     detection.depth * np.sin(detection.altitude),
-                     detection.depth, detection.velocity, detection.azimuth, detection.altitude])
+            PointField(name='ElevationAngle', offset=24, datatype=PointField.FLOAT32, count=1)]
+
+    detections = np.frombuffer(carla_radar_measurement.raw_data,
+                               dtype=pc.RADAR_DETECTION_DTYPE)
+    payload = bytearray(len(detections) * pc.RADAR_DTYPE.itemsize)
+    points = np.frombuffer(payload, dtype=pc.RADAR_DTYPE)
+
+    depth = detections['depth']
+    azimuth = detections['azimuth']
+    altitude = detections['altitude']
+    horizontal = depth * np.cos(altitude)
+    points['x'] = horizontal * np.cos(azimuth)
+    points['y'] = -horizontal * np.sin(azimuth)
+    points['z'] = depth * np.sin(altitude)
+    points['Range'] = depth
+    points['Velocity'] = detections['velocity']
+    points['AzimuthAngle'] = azimuth
+    points['ElevationAngle'] = altitude
+
     radar_msg = create_cloud(self.get_msg_header(
-            timestamp=carla_radar_measurement.timestamp), fields, points)
+            timestamp=carla_radar_measurement.timestamp), fields, payload)
     self.radar_publisher.write(radar_msg)
@@ -14,6 +14,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import numpy as np
+
+from modules.transform.proto.transform_pb2 import TransformStamped
+
+import carla_bridge.common.point_cloud as pc
+
+from carla_bridge.common.frame_buffer import FrameBuffer
+
 
 class Sensor(Actor):
   def __init__(self, uid, name, parent, relative_spawn_pose, node, carla_actor, synchronous_mode, is_event_sensor=False):
@@ -24,7 +32,9 @@ class Sensor(Actor):
                                  carla_actor=carla_actor)
     self.relative_spawn_pose = relative_spawn_pose
     self.synchronous_mode = synchronous_mode
-    self.queue = queue.Queue()
+    self.buffer = FrameBuffer(
+        capacity=node.parameters.get('sensor_buffer_size', 8),
+        policy=node.parameters.get('sensor_buffer_policy', FrameBuffer.DROP_OLDEST))
     self.next_data_expected_time = None
     self.sensor_tick_time = None
     self.is_event_sensor = is_event_sensor
@@ -35,7 +45,7 @@ class Sensor(Actor):
     except:
       self.sensor_tick_time = None
 
-    self._tf_broadcaster = tf2_ros.TransformBroadcaster(node)
+    self._static_tf_published = False
 
   def get_transform(self, pose, timestamp):
     if self.synchronous_mode:
@@ -51,8 +61,8 @@ class Sensor(Actor):
       child_frame_id = self.get_prefix()
       frame_id = "map"
 
-    transform = tf2_ros.TransformStamped()
-    transform.header.stamp = roscomp.ros_timestamp(sec=timestamp, from_sec=True)
+    transform = TransformStamped()
+    transform.header.timestamp_sec = timestamp
     transform.header.frame_id = frame_id
     transform.child_frame_id = child_frame_id
 
@@ -60,19 +70,30 @@ class Sensor(Actor):
     transform.transform.translation.y = pose.position.y
     transform.transform.translation.z = pose.position.z
 
-    transform.transform.rotation.x = pose.orientation.x
-    transform.transform.rotation.y = pose.orientation.y
-    transform.transform.rotation.z = pose.orientation.z
-    transform.transform.rotation.w = pose.orientation.w
+    transform.transform.rotation.qx = pose.orientation.qx
+    transform.transform.rotation.qy = pose.orientation.qy
+    transform.transform.rotation.qz = pose.orientation.qz
+    transform.transform.rotation.qw = pose.orientation.qw
 
     return transform
 
+  def set_relative_spawn_pose(self, pose):
+    self.relative_spawn_pose = pose
+    self._static_tf_published = False
+
   def publish_tf(self, pose, timestamp):
+    # in synchronous mode the transform to the parent is static, it is
+    # only published again after the relative spawn pose changed
+    if self.synchronous_mode and self._static_tf_published:
+      return
     transform = self.get_transform(pose, timestamp)
-    try:
-      self._tf_broadcaster.sendTransform(transform)
-    except:
-      pass
+    if transform is None:
+      return
+    if self.synchronous_mode:
+      self.node.tf_publisher.set_static(transform)
+      self._static_tf_published = True
+    else:
+      self.node.tf_publisher.add(transform)
 
   def listen(self):
     self.carla_actor.listen(self._callback_sensor_data)
@@ -81,6 +102,8 @@ class Sensor(Actor):
     self._callback_active.acquire()
     if self.carla_actor.is_listening:
       self.carla_actor.stop()
+    if self._static_tf_published:
+      self.node.tf_publisher.remove_static(self.get_prefix())
     super(Sensor, self).destroy()
 
   def _callback_sensor_data(self, carla_sensor_data):
@@ -90,7 +113,7 @@ class Sensor(Actor):
       if self.sensor_tick_time:
         self.next_data_expected_time = carla_sensor_data.timestamp + \
                     float(self.sensor_tick_time)
-      self.queue.put(carla_sensor_data)
+      self.buffer.put(carla_sensor_data.frame, carla_sensor_data)
     else:
       self.publish_tf(trans.carla_transform_to_ros_pose(
                 carla_sensor_data.transform), carla_sensor_data.timestamp)
@@ -104,35 +127,29 @@ class Sensor(Actor):
   def sensor_data_updated(self, carla_sensor_data):
     pass
 
+  def buffer_stats(self):
+    return {"size": len(self.buffer),
+            "dropped": self.buffer.dropped,
+            "overflows": self.buffer.overflows}
+
   def _update_synchronous_event_sensor(self, frame, timestamp):
-    while True:
-      try:
-        carla_sensor_data = self.queue.get(block=False)
-        if carla_sensor_data.frame != frame:
-          pass
-        self.publish_tf(trans.carla_transform_to_ros_pose(
-                    carla_sensor_data.transform), timestamp)
-        self.sensor_data_updated(carla_sensor_data)
-      except queue.Empty:
-        return
+    for carla_sensor_data in self.buffer.pop_all():
+      self.publish_tf(None, timestamp)
+      self.sensor_data_updated(carla_sensor_data)
+
+  def is_data_expected(self, timestamp):
+    # a sensor ticking slower than the world has no data for every frame
+    return not (self.next_data_expected_time and self.buffer.empty() and
+                self.next_data_expected_time >= timestamp)
 
   def _update_synchronous_sensor(self, frame, timestamp):
-    while not self.next_data_expected_time or \
-            (not self.queue.empty() or
-             self.next_data_expected_time and
-             self.next_data_expected_time < timestamp):
-      while True:
-        try:
-          carla_sensor_data = self.queue.get(timeout=1.0)
-          if carla_sensor_data.frame == frame:
-            self.publish_tf(trans.carla_transform_to_ros_pose(
-                            carla_sensor_data.transform), timestamp)
-            self.sensor_data_updated(carla_sensor_data)
-            return
-          elif carla_sensor_data.frame < frame:
-            pass
-        except queue.Empty:
-          return
+    if not self.is_data_expected(timestamp):
+      return
+    # the actor factory waits for the data of all sensors at once
+    carla_sensor_data = self.buffer.get(frame, timeout=0)
+    if carla_sensor_data is not None:
+      self.publish_tf(None, timestamp)
+      self.sensor_data_updated(carla_sensor_data)
 
   def update(self, frame, timestamp):
     if self.synchronous_mode:
@@ -144,4 +161,24 @@ class Sensor(Actor):
 
 
 def create_cloud(header, fields, points):
-  pass
+  """Create a PointCloud2 message.
+
+  points can be a numpy array laid out as fields, or an already packed
+  bytes-like payload, which is used as message data without copying.
+  """
+  point_step = pc.fields_to_dtype(fields).itemsize
+  if isinstance(points, np.ndarray):
+    points = points.tobytes()
+  width = memoryview(points).nbytes // point_step
+
+  cloud = PointCloud2()
+  cloud.header = header
+  cloud.height = 1
+  cloud.width = width
+  cloud.is_dense = False
+  cloud.is_bigendian = False
+  cloud.fields = fields
+  cloud.point_step = point_step
+  cloud.row_step = point_step * width
+  cloud.data = points
+  return cloud
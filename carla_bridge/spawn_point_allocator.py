@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+
+# Copyright 2022 daohu527 <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Hand out spawn points that are not occupied by other actors
+"""
+
+import itertools
+import math
+import random
+
+from threading import Lock
+
+
+class SpawnPointAllocator(object):
+  """Select free spawn points using a grid of the current actor positions.
+
+  Positions of the tracked actors, vehicles and walkers, come from the
+  world snapshot and are treated as circles of actor_radius. Static actors
+  like traffic signs are not tracked, they do not block the lanes. A spawn
+  point is free if a circle of the requested radius around it touches
+  neither an actor nor another reserved point. Reservations are kept in a
+  grid of their own until released because the spawn failed, or, once
+  confirmed, until the spawned actor shows up in a snapshot. Reservations
+  which are neither confirmed nor released, or whose actor never shows up,
+  expire max_age snapshots after they were made or confirmed.
+  """
+  # radius of blueprints whose size was not seen yet, by id prefix
+  DEFAULT_RADII = (('vehicle', 3.0), ('walker', 0.5))
+  DEFAULT_RADIUS = 1.0
+
+  def __init__(self, spawn_points, cell_size=10.0, actor_radius=2.5, max_age=50):
+    self.spawn_points = list(spawn_points)
+    self.cell_size = cell_size
+    self.actor_radius = actor_radius
+    self.max_age = max_age
+    self._grid = {}
+    self._tracked = set()
+    self._updates = 0
+    # token -> (x, y, radius, actor id, update count at reservation or confirmation)
+    self._reservations = {}
+    # cell -> tokens of the reservations in it
+    self._reserved_cells = {}
+    self._max_reserved_radius = 0.
+    self._radii = {}
+    self._token_gen = itertools.count()
+    self._rng = random.SystemRandom()
+    self._lock = Lock()
+
+  def track(self, actor_id, type_id, extent):
+    """Count actor_id as obstacle and remember the size of its blueprint."""
+    with self._lock:
+      self._tracked.add(actor_id)
+      self._radii[type_id] = math.hypot(extent.x, extent.y)
+
+  def untrack(self, actor_id):
+    with self._lock:
+      self._tracked.discard(actor_id)
+
+  def get_radius(self, type_id):
+    with self._lock:
+      if type_id in self._radii:
+        return self._radii[type_id]
+    for prefix, radius in SpawnPointAllocator.DEFAULT_RADII:
+      if type_id.startswith(prefix):
+        return radius
+    return SpawnPointAllocator.DEFAULT_RADIUS
+
+  def update(self, world_snapshot):
+    with self._lock:
+      tracked = set(self._tracked)
+    grid = {}
+    actor_ids = set()
+    for actor_snapshot in world_snapshot:
+      actor_ids.add(actor_snapshot.id)
+      if actor_snapshot.id not in tracked:
+        continue
+      location = actor_snapshot.get_transform().location
+      grid.setdefault(self._cell(location.x, location.y), []).append((location.x, location.y))
+    with self._lock:
+      self._grid = grid
+      self._updates += 1
+      # the snapshot covers the spawned actors from now on
+      expired = [token for token, (_, _, _, actor_id, stamp) in self._reservations.items()
+                 if actor_id in actor_ids or self._updates - stamp > self.max_age]
+      for token in expired:
+        self._unreserve(token)
+
+  def allocate(self, type_id):
+    """Reserve a free spawn point, returns (token, transform).
+
+    Raises IndexError if all spawn points are occupied.
+    """
+    radius = self.get_radius(type_id)
+    candidates = list(range(len(self.spawn_points)))
+    self._rng.shuffle(candidates)
+    with self._lock:
+      for index in candidates:
+        transform = self.spawn_points[index]
+        location = transform.location
+        if self._is_free(location.x, location.y, radius):
+          token = next(self._token_gen)
+          self._reserve(token, (location.x, location.y, radius, None, self._updates))
+          return token, transform
+    raise IndexError("No free spawn point for '{}'".format(type_id))
+
+  def confirm(self, token, actor_id):
+    """actor_id was spawned, keep the point until a snapshot contains it."""
+    with self._lock:
+      if token in self._reservations:
+        x, y, radius, _, _ = self._reservations[token]
+        self._reservations[token] = (x, y, radius, actor_id, self._updates)
+
+  def release(self, token):
+    with self._lock:
+      self._unreserve(token)
+
+  def _cell(self, x, y):
+    return (int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size)))
+
+  def _reserve(self, token, reservation):
+    self._reservations[token] = reservation
+    self._reserved_cells.setdefault(self._cell(reservation[0], reservation[1]), set()).add(token)
+    self._max_reserved_radius = max(self._max_reserved_radius, reservation[2])
+
+  def _unreserve(self, token):
+    reservation = self._reservations.pop(token, None)
+    if reservation is None:
+      return
+    cell = self._cell(reservation[0], reservation[1])
+    tokens = self._reserved_cells[cell]
+    tokens.discard(token)
+    if not tokens:
+      del self._reserved_cells[cell]
+
+  def _is_free(self, x, y, radius):
+    clearance = radius + self.actor_radius
+    span = int(math.ceil(clearance / self.cell_size))
+    cell_x, cell_y = self._cell(x, y)
+    for dx in range(-span, span + 1):
+      for dy in range(-span, span + 1):
+        for other_x, other_y in self._grid.get((cell_x + dx, cell_y + dy), ()):
+          if math.hypot(x - other_x, y - other_y) < clearance:
+            return False
+    span = int(math.ceil((radius + self._max_reserved_radius) / self.cell_size))
+    for dx in range(-span, span + 1):
+      for dy in range(-span, span + 1):
+        for token in self._reserved_cells.get((cell_x + dx, cell_y + dy), ()):
+          other_x, other_y, other_radius, _, _ = self._reservations[token]
+          if math.hypot(x - other_x, y - other_y) < radius + other_radius:
+            return False
+    return True
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+# Copyright 2022 daohu527 <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Publish static and per frame transforms in batches
+"""
+
+import time
+
+from threading import Lock
+
+from modules.transform.proto.transform_pb2 import TransformStampeds
+
+
+class TFPublisher(object):
+  """Collect transforms and publish them as one message.
+
+  Static transforms are kept and published, all of them together, when one
+  of them changes and every static_period seconds from flush(), since the
+  writer does not latch and late subscribers would miss them otherwise.
+  Dynamic transforms are collected during a frame and written in a single
+  message by flush().
+  """
+  def __init__(self, node, static_period=1.0):
+    self.static_period = static_period
+    self._static_published = None
+    self._static_transforms = {}
+    self._transforms = []
+    self._lock = Lock()
+    self._static_tf_publisher = node.create_writer("/tf_static", TransformStampeds, 10)
+    self._tf_publisher = node.create_writer("/tf", TransformStampeds, 10)
+
+  def set_static(self, transform):
+    with self._lock:
+      self._static_transforms[transform.child_frame_id] = transform
+      self._publish_static()
+
+  def remove_static(self, child_frame_id):
+    with self._lock:
+      if self._static_transforms.pop(child_frame_id, None) is not None:
+        self._publish_static()
+
+  def add(self, transform):
+    with self._lock:
+      self._transforms.append(transform)
+
+  def flush(self):
+    with self._lock:
+      transforms, self._transforms = self._transforms, []
+      if self._static_transforms and (self._static_published is None or
+          time.monotonic() - self._static_published >= self.static_period):
+        self._publish_static()
+    if transforms:
+      tf_msg = TransformStampeds()
+      tf_msg.transforms.extend(transforms)
+      self._tf_publisher.write(tf_msg)
+
+  def _publish_static(self):
+    self._static_published = time.monotonic()
+    tf_msg = TransformStampeds()
+    tf_msg.transforms.extend(self._static_transforms.values())
+    self._static_tf_publisher.write(tf_msg)
@@ -59,7 +59,7 @@ class TrafficParticipant(Actor):
     return color
 
   def get_marker_pose(self):
-    return trans.carla_transform_to_ros_pose(self.carla_actor.get_transform())
+    return trans.carla_transform_to_ros_pose(self.get_carla_transform())
 
   def get_marker(self, timestamp=None):
     marker = Marker(header=self.get_msg_header(frame_id="map", timestamp=timestamp))
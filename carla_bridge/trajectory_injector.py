@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+# Copyright 2022 daohu527 <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Set the poses and velocities of many actors at once
+"""
+
+import logging
+
+from threading import Lock
+
+import numpy as np
+
+import carla
+
+from carla_msgs.msg import CarlaActorStateArray
+
+from carla_bridge.actor import Actor
+
+
+def quaternions_to_carla_rotations(qx, qy, qz, qw):
+  """Convert arrays of quaternions to carla roll, pitch and yaw in degrees."""
+  roll = np.arctan2(2.0 * (qw * qx + qy * qz), 1.0 - 2.0 * (qx * qx + qy * qy))
+  pitch = np.arcsin(np.clip(2.0 * (qw * qy - qz * qx), -1.0, 1.0))
+  yaw = np.arctan2(2.0 * (qw * qz + qx * qy), 1.0 - 2.0 * (qy * qy + qz * qz))
+  return np.degrees(roll), -np.degrees(pitch), -np.degrees(yaw)
+
+
+class TrajectoryInjector(object):
+  """Teleport actors to the states of a CarlaActorStateArray message.
+
+  All states of a message are converted to carla coordinates together.
+  The resulting commands are kept, the latest per actor, until flush()
+  applies them in one batch right before the next tick.
+  """
+  def __init__(self, actor_factory, node, client=None):
+    self._actor_factory = actor_factory
+    self.client = client
+    self._commands = {}
+    self._lock = Lock()
+    self.dropped = 0
+    self._actor_state_subscriber = node.create_reader(
+      "/carla/actor_state_cmd",
+      CarlaActorStateArray,
+      self.actor_states_updated)
+
+  def actor_states_updated(self, actor_states):
+    ids = np.asarray(actor_states.id, dtype=np.uint32)
+    if not len(ids):
+      return
+
+    uids = ids.tolist()
+    commands = [[] for _ in uids]
+    if len(actor_states.x):
+      locations = np.column_stack((np.asarray(actor_states.x),
+                                   -np.asarray(actor_states.y),
+                                   np.asarray(actor_states.z)))
+      rotations = np.column_stack(quaternions_to_carla_rotations(
+          np.asarray(actor_states.qx), np.asarray(actor_states.qy),
+          np.asarray(actor_states.qz), np.asarray(actor_states.qw)))
+      if not len(locations) == len(rotations) == len(ids):
+        logging.warn("Actor state message with poses of different lengths ignored")
+        return
+      for uid, actor_commands, location, (roll, pitch, yaw) in zip(
+          uids, commands, locations.tolist(), rotations.tolist()):
+        actor_commands.append(carla.command.ApplyTransform(uid, carla.Transform(
+            carla.Location(*location), carla.Rotation(pitch=pitch, yaw=yaw, roll=roll))))
+
+    if len(actor_states.vx):
+      velocities = np.column_stack((np.asarray(actor_states.vx),
+                                    -np.asarray(actor_states.vy),
+                                    np.asarray(actor_states.vz)))
+      if not len(velocities) == len(ids):
+        logging.warn("Actor state message with velocities of different lengths ignored")
+        return
+      for uid, actor_commands, velocity in zip(uids, commands, velocities.tolist()):
+        actor_commands.append(carla.command.ApplyTargetVelocity(uid, carla.Vector3D(*velocity)))
+
+    actors = self._actor_factory.actors
+    with self._lock:
+      for uid, actor_commands in zip(uids, commands):
+        if not isinstance(actors.get(uid), Actor):
+          self.dropped += 1
+          continue
+        self._commands[uid] = actor_commands
+
+  def flush(self):
+    with self._lock:
+      commands, self._commands = self._commands, {}
+    if not commands:
+      return
+
+    if self.client is not None:
+      self.client.apply_batch([command for actor_commands in commands.values()
+                               for command in actor_commands])
+      return
+    actors = self._actor_factory.actors
+    for uid, actor_commands in commands.items():
+      actor = actors.get(uid)
+      if actor is None:
+        continue
+      for command in actor_commands:
+        if isinstance(command, carla.command.ApplyTransform):
+          actor.carla_actor.set_transform(command.transform)
+        else:
+          actor.carla_actor.set_target_velocity(command.velocity)
@@ -45,7 +45,7 @@ class Vehicle(TrafficParticipant):
 
   def get_marker_pose(self):
     extent = self.carla_actor.bounding_box.extent
-    marker_transform = self.carla_actor.get_transform()
+    marker_transform = self.get_carla_transform()
     marker_transform.location += marker_transform.get_up_vector() * extent.z
     return trans.carla_transform_to_ros_pose(marker_transform)
 
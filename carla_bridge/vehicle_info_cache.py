@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+# Copyright 2022 daohu527 <daohu527@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Physics of the vehicle models, as published in the vehicle info
+"""
+
+import math
+
+from threading import Lock
+
+import numpy as np
+
+import carla_bridge.common.json_cache as json_cache
+
+
+class VehicleInfoCache(object):
+  """Vehicle physics indexed by blueprint id.
+
+  The physics control of a model is requested once, the wheel positions
+  are converted to the vehicle frame at that time, so the entry holds for
+  every later vehicle of the same model. With a cache_dir the entries are
+  stored per carla version and survive restarts.
+  """
+  PHYSICS_FIELDS = (
+      "max_rpm", "moi", "damping_rate_full_throttle",
+      "damping_rate_zero_throttle_clutch_engaged",
+      "damping_rate_zero_throttle_clutch_disengaged", "use_gear_autobox",
+      "gear_switch_time", "clutch_strength", "mass", "drag_coefficient")
+  WHEEL_FIELDS = (
+      "tire_friction", "damping_rate", "radius", "max_brake_torque",
+      "max_handbrake_torque")
+
+  def __init__(self, version=None, cache_dir=None):
+    self._cache_file = json_cache.get_cache_file(cache_dir, "vehicle_info", version)
+    self._lock = Lock()
+    self._infos = json_cache.load(self._cache_file) if self._cache_file else None
+    if self._infos is None:
+      self._infos = {}
+
+  def __contains__(self, type_id):
+    return type_id in self._infos
+
+  def get(self, carla_actor, transform):
+    """Return the info of the model of carla_actor located at transform."""
+    info = self._infos.get(carla_actor.type_id)
+    if info is not None:
+      return info
+
+    info = self._create_info(carla_actor.get_physics_control(), transform)
+    with self._lock:
+      self._infos[carla_actor.type_id] = info
+      if self._cache_file:
+        json_cache.save(self._cache_file, self._infos)
+    return info
+
+  @staticmethod
+  def _create_info(vehicle_physics, transform):
+    info = dict((field, getattr(vehicle_physics, field))
+                for field in VehicleInfoCache.PHYSICS_FIELDS)
+    info["center_of_mass"] = [vehicle_physics.center_of_mass.x,
+                              vehicle_physics.center_of_mass.y,
+                              vehicle_physics.center_of_mass.z]
+
+    wheels = list(vehicle_physics.wheels)
+    info["wheels"] = []
+    if not wheels:
+      return info
+
+    # wheel positions are given in the map in cm
+    inv_T = np.array(transform.get_inverse_matrix(), dtype=float)
+    wheel_pos_in_map = np.ones((len(wheels), 4))
+    wheel_pos_in_map[:, :3] = [[wheel.position.x, wheel.position.y, wheel.position.z]
+                               for wheel in wheels]
+    wheel_pos_in_map[:, :3] /= 100.0
+    wheel_pos_in_ego_vehicle = np.matmul(wheel_pos_in_map, inv_T.T)
+
+    for wheel, position in zip(wheels, wheel_pos_in_ego_vehicle):
+      wheel_info = dict((field, getattr(wheel, field))
+                        for field in VehicleInfoCache.WHEEL_FIELDS)
+      wheel_info["max_steer_angle"] = math.radians(wheel.max_steer_angle)
+      wheel_info["position"] = [float(position[0]), float(-position[1]), float(position[2])]
+      info["wheels"].append(wheel_info)
+    return info
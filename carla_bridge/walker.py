@@ -27,13 +27,16 @@ class Walker(TrafficParticipant):
                                  node=node,
                                  carla_actor=carla_actor)
 
-    self.control_subscriber = self.node.create_reader(
-      self.get_topic_prefix() + "/walker_control_cmd",
-      CarlaWalkerControl,
-      self.control_command_updated)
+    # walkers can be controlled all together on /carla/crowd_control_cmd
+    self.control_subscriber = None
+    if self.node.parameters.get("walker_control_readers", True):
+      self.control_subscriber = self.node.create_reader(
+        self.get_topic_prefix() + "/walker_control_cmd",
+        CarlaWalkerControl,
+        self.control_command_updated)
 
   def destroy(self):
-    pass
+    self.node.control_mailbox.discard(self.carla_actor.id)
 
   def control_command_updated(self, cyber_walker_control):
     walker_control = WalkerControl()
@@ -42,7 +45,7 @@ class Walker(TrafficParticipant):
     walker_control.direction.z = cyber_walker_control.direction.z
     walker_control.speed = cyber_walker_control.speed
     walker_control.jump = cyber_walker_control.jump
-    self.carla_actor.apply_control(walker_control)
+    self.node.control_mailbox.post(self.carla_actor, walker_control)
 
   def get_classification(self):
     return Object.CLASSIFICATION_PEDESTRIAN
\ No newline at end of file